@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+backtest_cache.py
+
+Cache dei risultati di backtest indirizzata per contenuto:
+- Chiave: hash dell'impronta delle candele (intervallo e contenuto della serie), dei parametri
+  e delle impostazioni di costo (commissione, slippage, capitale, periodi/anno).
+- Valore: record di metriche METRICS_DTYPE (pochi byte per run).
+- Su disco un file npz per serie di candele (chiavi + record), con limite di dimensione
+  ed eviction dei file usati meno di recente; contatori di hit/miss.
+"""
+
+import hashlib
+import json
+import os
+from threading import Lock
+import numpy as np
+from config import COMMISSION_RATE, SLIPPAGE_RATE, INITIAL_CAPITAL, BACKTEST_CACHE_DISK_MAX_MB
+from backtest_metrics import METRICS_DTYPE
+
+BACKTEST_CACHE_DIR = "data/backtest_cache"
+# Da incrementare quando cambia la logica di simulazione o delle metriche
+ENGINE_VERSION = 1
+
+def data_fingerprint(data, interval) -> str:
+    """
+    Impronta di una serie OHLCV (DataFrame o {colonna: array}): cambia se cambia qualsiasi candela.
+    """
+    digest = hashlib.sha1(f"{interval}|{ENGINE_VERSION}".encode())
+    if hasattr(data, "index"):
+        digest.update(np.asarray(data.index.values).view(np.int64).tobytes())
+    for col in ["Open", "High", "Low", "Close", "Volume"]:
+        digest.update(np.ascontiguousarray(data[col], dtype=np.float64).tobytes())
+    return digest.hexdigest()[:20]
+
+def cost_settings(commission=COMMISSION_RATE, slippage=SLIPPAGE_RATE, initial_capital=INITIAL_CAPITAL,
+                  periods=365 * 6) -> tuple:
+    return (commission, slippage, initial_capital, periods)
+
+def result_key(params, costs) -> bytes:
+    payload = json.dumps([params, list(costs)], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:24].encode()
+
+class BacktestResultCache:
+    def __init__(self, cache_dir=BACKTEST_CACHE_DIR, disk_max_bytes=BACKTEST_CACHE_DISK_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.shards = {}
+        self.dirty = set()
+        self.lock = Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evicted_files": 0}
+
+    def _path(self, fingerprint):
+        return os.path.join(self.cache_dir, f"{fingerprint}.npz")
+
+    def _shard(self, fingerprint):
+        shard = self.shards.get(fingerprint)
+        if shard is None:
+            shard = {}
+            path = self._path(fingerprint)
+            if os.path.exists(path):
+                try:
+                    with np.load(path) as npz:
+                        shard = dict(zip(npz["keys"].tolist(), npz["metrics"]))
+                    os.utime(path)
+                except Exception as e:
+                    print(f"[backtest_cache] Errore lettura {path}: {e}")
+            self.shards[fingerprint] = shard
+        return shard
+
+    def get_many(self, fingerprint, keys):
+        """
+        Restituisce (record trovati in un array METRICS_DTYPE, maschera degli hit).
+        """
+        out = np.zeros(len(keys), dtype=METRICS_DTYPE)
+        found = np.zeros(len(keys), dtype=bool)
+        with self.lock:
+            shard = self._shard(fingerprint)
+            for i, key in enumerate(keys):
+                record = shard.get(key)
+                if record is not None:
+                    out[i] = record
+                    found[i] = True
+            self.stats["hits"] += int(found.sum())
+            self.stats["misses"] += int(len(keys) - found.sum())
+        return out, found
+
+    def put_many(self, fingerprint, keys, metrics):
+        with self.lock:
+            shard = self._shard(fingerprint)
+            for key, record in zip(keys, metrics):
+                shard[key] = record
+            self.stats["stores"] += len(keys)
+            self.dirty.add(fingerprint)
+
+    def flush(self):
+        """
+        Scrive su disco le serie modificate (in modo atomico) e applica il limite di dimensione.
+        """
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            shards = {fp: dict(self.shards[fp]) for fp in dirty}
+        if not shards:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for fingerprint, shard in shards.items():
+                path = self._path(fingerprint)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    np.savez_compressed(f, keys=np.array(list(shard), dtype="S24"),
+                                        metrics=np.array(list(shard.values()), dtype=METRICS_DTYPE))
+                os.replace(tmp_path, path)
+            self._prune_disk()
+        except Exception as e:
+            print(f"[backtest_cache] Errore scrittura su disco: {e}")
+
+    def _prune_disk(self):
+        files = [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if f.endswith(".npz")]
+        files.sort(key=os.path.getmtime)
+        total = sum(os.path.getsize(f) for f in files)
+        while files and total > self.disk_max_bytes:
+            oldest = files.pop(0)
+            total -= os.path.getsize(oldest)
+            os.remove(oldest)
+            with self.lock:
+                self.shards.pop(os.path.basename(oldest)[:-4], None)
+                self.stats["evicted_files"] += 1
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.stats, series=len(self.shards),
+                        entries=sum(len(shard) for shard in self.shards.values()))
+
+    def clear(self):
+        with self.lock:
+            self.shards.clear()
+            self.dirty.clear()
+
+backtest_cache = BacktestResultCache()
+
+def get_backtest_cache_stats() -> dict:
+    return backtest_cache.get_stats()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+backtest_metrics.py
+
+Contabilità vettorializzata del backtest:
+- Converte i trade (indici di ingresso/uscita) in una curva di equity candela per candela,
+  al netto di commissioni e slippage (COMMISSION_RATE, SLIPPAGE_RATE) a partire da INITIAL_CAPITAL.
+- Calcola rendimento, Sharpe, Sortino, max drawdown, esposizione e turnover senza loop Python;
+  gli array possono essere 1-D (una serie) o 2-D (insieme di parametri x tempo).
+- Le metriche sono record NumPy compatti (METRICS_DTYPE): migliaia di run si ordinano con argsort.
+"""
+
+import numpy as np
+from config import COMMISSION_RATE, SLIPPAGE_RATE, INITIAL_CAPITAL
+from kline_store import interval_to_ms
+from vectorized_backtest import position_mask
+
+METRICS_DTYPE = np.dtype([
+    ("trades", np.int32),
+    ("total_return_pct", np.float64),
+    ("sharpe", np.float64),
+    ("sortino", np.float64),
+    ("max_drawdown_pct", np.float64),
+    ("exposure", np.float64),
+    ("turnover", np.float64),
+    ("win_rate", np.float64),
+    ("final_equity", np.float64),
+])
+
+def periods_per_year(interval):
+    return 365 * 86_400_000 / interval_to_ms(interval)
+
+def trade_events(n, entry_idx, exit_idx):
+    """
+    Numero di eseguiti (ingressi + uscite) per candela; la posizione ancora aperta non paga l'uscita.
+    """
+    events = np.zeros(n, dtype=np.int64)
+    np.add.at(events, entry_idx, 1)
+    np.add.at(events, exit_idx[exit_idx >= 0], 1)
+    return events
+
+def equity_curve(close, position, events, commission=COMMISSION_RATE, slippage=SLIPPAGE_RATE,
+                 initial_capital=INITIAL_CAPITAL):
+    """
+    Equity con tutto il capitale investito quando la posizione è aperta; ogni eseguito
+    costa commissione + slippage sul controvalore. 'position' ed 'events' possono essere 2-D.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    bar_returns = np.zeros(close.shape)
+    bar_returns[..., 1:] = close[..., 1:] / close[..., :-1] - 1
+    growth = (1 + np.where(position, bar_returns, 0.0)) * (1 - commission - slippage) ** events
+    return initial_capital * np.cumprod(growth, axis=-1)
+
+def equity_metrics(equity, position, events, trade_returns=None, periods=365 * 6,
+                   initial_capital=INITIAL_CAPITAL):
+    """
+    Metriche sull'ultimo asse della curva di equity; restituisce un array di record METRICS_DTYPE
+    (0-D per una singola serie). trade_returns (facoltativo, solo 1-D) serve per il win rate.
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    prev = np.concatenate([np.full(equity.shape[:-1] + (1,), initial_capital), equity[..., :-1]], axis=-1)
+    returns = equity / prev - 1
+    mean = returns.mean(axis=-1)
+    std = returns.std(axis=-1)
+    downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2, axis=-1))
+    peak = np.maximum.accumulate(equity, axis=-1)
+    traded = np.sum(np.where(events > 0, prev * events, 0.0), axis=-1)
+    out = np.zeros(equity.shape[:-1], dtype=METRICS_DTYPE)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["sharpe"] = np.where(std > 0, mean / std * np.sqrt(periods), 0.0)
+        out["sortino"] = np.where(downside > 0, mean / downside * np.sqrt(periods), 0.0)
+    out["trades"] = np.sum(events, axis=-1) // 2
+    out["total_return_pct"] = (equity[..., -1] / initial_capital - 1) * 100
+    out["max_drawdown_pct"] = np.max(1 - equity / peak, axis=-1) * 100
+    out["exposure"] = np.mean(position, axis=-1)
+    out["turnover"] = traded / equity.mean(axis=-1)
+    out["final_equity"] = equity[..., -1]
+    if trade_returns is not None and len(trade_returns):
+        out["win_rate"] = np.mean(trade_returns > 0)
+    return out
+
+def evaluate_trades(close, entry_idx, exit_idx, commission=COMMISSION_RATE, slippage=SLIPPAGE_RATE,
+                    initial_capital=INITIAL_CAPITAL, periods=365 * 6):
+    """
+    Dai trade alla curva di equity netta e alle metriche. Restituisce un BacktestResult.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    position = position_mask(len(close), entry_idx, exit_idx)
+    events = trade_events(len(close), entry_idx, exit_idx)
+    equity = equity_curve(close, position, events, commission, slippage, initial_capital)
+    closed = exit_idx >= 0
+    cost = (1 - commission - slippage) ** 2
+    trade_returns = close[exit_idx[closed]] / close[entry_idx[closed]] * cost - 1
+    metrics = equity_metrics(equity, position, events, trade_returns, periods, initial_capital)
+    return BacktestResult(metrics, equity)
+
+class BacktestResult:
+    """
+    Risultato compatto di un backtest: record di metriche (METRICS_DTYPE) e curva di equity.
+    """
+    __slots__ = ("metrics", "equity")
+
+    def __init__(self, metrics, equity):
+        self.metrics = metrics
+        self.equity = equity
+
+    def __getitem__(self, field):
+        return self.metrics[field].item()
+
+    def as_dict(self) -> dict:
+        return {field: self.metrics[field].item() for field in METRICS_DTYPE.names}
+
+    def summary(self) -> str:
+        m = self.as_dict()
+        return (f"Rendimento netto: {m['total_return_pct']:.2f}% | Sharpe: {m['sharpe']:.2f} | "
+                f"Sortino: {m['sortino']:.2f} | Max DD: {m['max_drawdown_pct']:.2f}% | "
+                f"Esposizione: {m['exposure']:.1%} | Turnover: {m['turnover']:.1f} | Trade: {m['trades']}")
+
+def rank(metrics, key="sharpe", top_k=None):
+    """
+    Indici dei run ordinati per 'key' decrescente (array di record METRICS_DTYPE).
+    """
+    order = np.argsort(-metrics[key], kind="stable")
+    return order if top_k is None else order[:top_k]
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+backtest_plots.py
+
+Grafici del backtest (prezzo, RSI, MACD, OBV e bande).
+Separato dal motore: matplotlib viene importato solo quando si disegna davvero.
+"""
+
+def analyze_and_plot(symbol, data, trades, save_path=None):
+    """
+    Disegna i grafici del backtest. Con save_path salva l'immagine senza aprire finestre
+    (backend Agg, utilizzabile anche senza display); altrimenti chiama plt.show().
+    """
+    import matplotlib
+    if save_path:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(14, 10))
+    plt.subplot(4,1,1)
+    plt.plot(data.index, data["Close"], label="Close Price")
+    plt.title(f"{symbol} - Prezzo di Chiusura")
+    plt.legend()
+    plt.subplot(4,1,2)
+    plt.plot(data.index, data["RSI"], label="RSI", color="purple")
+    plt.plot(data.index, data["RSI_MA"], label="RSI MA", color="yellow")
+    plt.axhline(70, color="red", linestyle="--", label="Overbought")
+    plt.axhline(30, color="green", linestyle="--", label="Oversold")
+    plt.title(f"{symbol} - RSI")
+    plt.legend()
+    plt.subplot(4,1,3)
+    plt.plot(data.index, data["MACD"], label="MACD", color="blue")
+    plt.plot(data.index, data["MACD_signal"], label="Signal", color="red")
+    plt.bar(data.index, data["MACD_hist"], label="Histogram", color="grey")
+    plt.axhline(0, color="black", linestyle="--")
+    plt.title(f"{symbol} - MACD")
+    plt.legend()
+    plt.subplot(4,1,4)
+    plt.plot(data.index, data["OBV"], label="OBV", color="teal")
+    if not data["upperBand"].isnull().all():
+        plt.plot(data.index, data["smoothingMA"], label="Smoothing MA", color="orange")
+        plt.plot(data.index, data["upperBand"], label="Upper Band", color="green")
+        plt.plot(data.index, data["lowerBand"], label="Lower Band", color="red")
+    plt.title(f"{symbol} - OBV e Bollinger Bands")
+    plt.legend()
+    plt.tight_layout()
+    if save_path:
+        fig.savefig(save_path)
+        plt.close(fig)
+    else:
+        plt.show()
@@ -3,79 +3,71 @@
 backtesting_engine.py
 
 Modulo per eseguire il backtest della strategia.
-Recupera dati storici, calcola indicatori e simula trade.
+Recupera dati storici (dall'archivio locale condiviso), calcola indicatori e simula trade.
+matplotlib e il client Binance sono importati solo quando servono (grafici, download),
+così l'import del modulo resta leggero e utilizzabile anche offline.
 """
 
-import os
-import pandas as pd
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 import numpy as np
-import matplotlib.pyplot as plt
-import pandas_ta as ta
-from datetime import datetime, timedelta
-from binance.client import Client
 import symbols_config
+import data_utils
+from indicator_cache import cached_compute_indicators
+from indicator_graph import SIGNAL_COLUMNS
+from vectorized_backtest import simulate_strategy_vectorized, data_masks, pair_trades
+from backtest_metrics import METRICS_DTYPE, evaluate_trades, periods_per_year
+from backtest_cache import backtest_cache, cost_settings, data_fingerprint, result_key
 from strategy_params import INTERVAL, LOOKBACK_DAYS, LC_RSI_NPERIODI, LC_RSI_MA_NPERIODI, FAST_LENGTH, SLOW_LENGTH, SIGNAL_LENGTH, LC_TIPO_MA, LC_MA1_NPERIODI, LC_MA2_NPERIODI, LC_MA3_NPERIODI, LC_MA4_NPERIODI, MA_TYPE_INPUT, MA_LENGTH_INPUT, BB_MULT_INPUT
-from config import COMMISSION_RATE, SLIPPAGE_RATE, INITIAL_CAPITAL, BOT_SETTINGS
-from telegram_notifications import send_telegram_message
-
-def get_historical_data(symbol, interval, lookback_days):
-    end_time = datetime.utcnow()
-    start_time = end_time - timedelta(days=lookback_days)
-    start_str = start_time.strftime("%d %b %Y")
-    print(f"Scaricando dati per {symbol} dal {start_str}...")
-    client = Client("", "", testnet=True)
-    klines = client.get_historical_klines(symbol, interval, start_str)
-    if not klines:
-        return pd.DataFrame()
-    df = pd.DataFrame(klines, columns=[
-        "Open Time", "Open", "High", "Low", "Close", "Volume",
-        "Close Time", "Quote Asset Volume", "Number of Trades",
-        "Taker Buy Base Asset Volume", "Taker Buy Quote Asset Volume", "Ignore"
-    ])
-    df["Open Time"] = pd.to_datetime(df["Open Time"], unit='ms')
-    for col in ["Open", "High", "Low", "Close", "Volume"]:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    df.set_index("Open Time", inplace=True)
-    df = df[["Open", "High", "Low", "Close", "Volume"]]
-    return df
-
-def compute_indicators(data):
-    data["OBV"] = ta.obv(data["Close"], data["Volume"])
-    data["RSI"] = ta.rsi(data["Close"], length=LC_RSI_NPERIODI)
-    data["RSI_MA"] = ta.ema(data["RSI"], length=LC_RSI_MA_NPERIODI)
-    macd = ta.macd(data["Close"], fast=FAST_LENGTH, slow=SLOW_LENGTH, signal=SIGNAL_LENGTH)
-    data = data.join(macd)
-    data.rename(columns={
-        f"MACD_{FAST_LENGTH}_{SLOW_LENGTH}_{SIGNAL_LENGTH}": "MACD",
-        f"MACDs_{FAST_LENGTH}_{SLOW_LENGTH}_{SIGNAL_LENGTH}": "MACD_signal",
-        f"MACDh_{FAST_LENGTH}_{SLOW_LENGTH}_{SIGNAL_LENGTH}": "MACD_hist"
-    }, inplace=True)
-    if LC_TIPO_MA == "EMA":
-        data["lcMa1"] = ta.ema(data["Close"], length=LC_MA1_NPERIODI)
-        data["lcMa2"] = ta.ema(data["Close"], length=LC_MA2_NPERIODI)
-        data["lcMa3"] = ta.ema(data["Close"], length=LC_MA3_NPERIODI)
-        data["lcMa4"] = ta.ema(data["Close"], length=LC_MA4_NPERIODI)
-    elif LC_TIPO_MA == "SMA":
-        data["lcMa1"] = ta.sma(data["Close"], length=LC_MA1_NPERIODI)
-        data["lcMa2"] = ta.sma(data["Close"], length=LC_MA2_NPERIODI)
-        data["lcMa3"] = ta.sma(data["Close"], length=LC_MA3_NPERIODI)
-        data["lcMa4"] = ta.sma(data["Close"], length=LC_MA4_NPERIODI)
-    elif LC_TIPO_MA == "WMA":
-        data["lcMa1"] = ta.wma(data["Close"], length=LC_MA1_NPERIODI)
-        data["lcMa2"] = ta.wma(data["Close"], length=LC_MA2_NPERIODI)
-        data["lcMa3"] = ta.wma(data["Close"], length=LC_MA3_NPERIODI)
-        data["lcMa4"] = ta.wma(data["Close"], length=LC_MA4_NPERIODI)
-    if MA_TYPE_INPUT in ["SMA", "SMA + Bollinger Bands"]:
-        data["smoothingMA"] = data["OBV"].rolling(window=MA_LENGTH_INPUT).mean()
-    elif MA_TYPE_INPUT == "EMA":
-        data["smoothingMA"] = ta.ema(data["OBV"], length=MA_LENGTH_INPUT)
-    if MA_TYPE_INPUT == "SMA + Bollinger Bands":
-        data["smoothingStDev"] = data["OBV"].rolling(window=MA_LENGTH_INPUT).std() * BB_MULT_INPUT
-        data["upperBand"] = data["smoothingMA"] + data["smoothingStDev"]
-        data["lowerBand"] = data["smoothingMA"] - data["smoothingStDev"]
-    return data
+from config import COMMISSION_RATE, SLIPPAGE_RATE, INITIAL_CAPITAL, BOT_SETTINGS, BACKTEST_WORKERS, ML_OVERRIDE_CONFIDENCE
+
+def get_historical_data(symbol, interval, lookback_days, offline=False):
+    """
+    Candele dall'archivio locale; se non offline, l'archivio è prima aggiornato da Binance
+    con il client condiviso di kline_fetcher (stesso ambiente, config.USE_TESTNET, del bot).
+    """
+    if offline:
+        return data_utils.get_local_data(symbol, interval, lookback_days)
+    from kline_fetcher import get_kline_fetcher
+    return get_kline_fetcher().fetch(symbol, interval, lookback_days)
+
+BACKTEST_PARAMS = {
+    "LC_RSI_NPERIODI": LC_RSI_NPERIODI,
+    "LC_RSI_MA_NPERIODI": LC_RSI_MA_NPERIODI,
+    "FAST_LENGTH": FAST_LENGTH,
+    "SLOW_LENGTH": SLOW_LENGTH,
+    "SIGNAL_LENGTH": SIGNAL_LENGTH,
+    "LC_TIPO_MA": LC_TIPO_MA,
+    "LC_MA1_NPERIODI": LC_MA1_NPERIODI,
+    "LC_MA2_NPERIODI": LC_MA2_NPERIODI,
+    "LC_MA3_NPERIODI": LC_MA3_NPERIODI,
+    "LC_MA4_NPERIODI": LC_MA4_NPERIODI,
+    "MA_TYPE_INPUT": MA_TYPE_INPUT,
+    "MA_LENGTH_INPUT": MA_LENGTH_INPUT,
+    "BB_MULT_INPUT": BB_MULT_INPUT
+}
+
+def compute_indicators(data, params=None):
+    return data_utils.compute_indicators(data, params or BACKTEST_PARAMS)
 
 def simulate_strategy(data):
+    return simulate_strategy_vectorized(data)
+
+def evaluate_data(data, interval=INTERVAL):
+    """
+    Curva di equity e metriche al netto di commissioni e slippage (BacktestResult)
+    per un DataFrame con gli indicatori già calcolati.
+    """
+    entry, exit_ = data_masks(data)
+    entry_idx, exit_idx = pair_trades(entry, exit_)
+    return evaluate_trades(data["Close"].to_numpy(dtype=np.float64), entry_idx, exit_idx,
+                           COMMISSION_RATE, SLIPPAGE_RATE, INITIAL_CAPITAL, periods_per_year(interval))
+
+def simulate_strategy_loop(data):
+    """
+    Implementazione originale candela per candela, mantenuta come riferimento per la regressione.
+    """
     trades = []
     ordine_aperto = False
     prezzo_apertura = 0.0
@@ -107,54 +99,231 @@ def simulate_strategy(data):
     print(f"Profitto totale strategia: {profitto_totale:.2f}%")
     return trades
 
-def analyze_and_plot(symbol, data, trades):
-    plt.figure(figsize=(14, 10))
-    plt.subplot(4,1,1)
-    plt.plot(data.index, data["Close"], label="Close Price")
-    plt.title(f"{symbol} - Prezzo di Chiusura")
-    plt.legend()
-    plt.subplot(4,1,2)
-    plt.plot(data.index, data["RSI"], label="RSI", color="purple")
-    plt.plot(data.index, data["RSI_MA"], label="RSI MA", color="yellow")
-    plt.axhline(70, color="red", linestyle="--", label="Overbought")
-    plt.axhline(30, color="green", linestyle="--", label="Oversold")
-    plt.title(f"{symbol} - RSI")
-    plt.legend()
-    plt.subplot(4,1,3)
-    plt.plot(data.index, data["MACD"], label="MACD", color="blue")
-    plt.plot(data.index, data["MACD_signal"], label="Signal", color="red")
-    plt.bar(data.index, data["MACD_hist"], label="Histogram", color="grey")
-    plt.axhline(0, color="black", linestyle="--")
-    plt.title(f"{symbol} - MACD")
-    plt.legend()
-    plt.subplot(4,1,4)
-    plt.plot(data.index, data["OBV"], label="OBV", color="teal")
-    if not data["upperBand"].isnull().all():
-        plt.plot(data.index, data["smoothingMA"], label="Smoothing MA", color="orange")
-        plt.plot(data.index, data["upperBand"], label="Upper Band", color="green")
-        plt.plot(data.index, data["lowerBand"], label="Lower Band", color="red")
-    plt.title(f"{symbol} - OBV e Bollinger Bands")
-    plt.legend()
-    plt.tight_layout()
-    plt.show()
+def analyze_and_plot(symbol, data, trades, save_path=None):
+    # matplotlib è importato solo qui, non all'import del modulo
+    from backtest_plots import analyze_and_plot as plot
+    plot(symbol, data, trades, save_path)
+
+def load_frames(symbols, interval, lookback_days=LOOKBACK_DAYS, offline=False):
+    """
+    Candele per più simboli, lette una sola volta: {simbolo: DataFrame} (i simboli senza dati sono esclusi).
+    """
+    frames = {}
+    for symbol in symbols:
+        df = get_historical_data(symbol, interval, lookback_days, offline)
+        if df.empty:
+            print(f"Nessun dato storico disponibile per {symbol}.")
+            continue
+        frames[symbol] = df
+    return frames
+
+def optimize_parameters(symbols=None, interval=None, lookback_days=LOOKBACK_DAYS, method="grid",
+                        n_samples=200, grid=None, workers=None, top_k=10, apply_best=False, offline=False):
+    """
+    Ottimizzazione parallela degli indicator_params su più simboli (grid o random search).
+    Le candele sono scaricate/lette una sola volta per simbolo; i risultati classificati sono
+    salvati in optimization_results.json e, con apply_best, applicati alla config dinamica.
+    """
+    import parameter_sweep
+    interval = interval or INTERVAL
+    frames = load_frames(symbols or symbols_config.SYMBOLS, interval, lookback_days, offline)
+    if not frames:
+        return {}
+    param_sets = parameter_sweep.build_param_sets(grid, method=method, n_samples=n_samples)
+    print(f"Ottimizzazione di {len(param_sets)} combinazioni su {len(frames)} simboli ({interval})...")
+    results = parameter_sweep.run_parameter_sweep(frames, param_sets, workers=workers, top_k=top_k,
+                                                  periods=periods_per_year(interval), interval=interval)
+    parameter_sweep.save_results(results)
+    if apply_best:
+        parameter_sweep.apply_results()
+    return results
+
+def walk_forward_optimization(symbols=None, interval=None, lookback_days=LOOKBACK_DAYS, train_days=180,
+                              test_days=30, anchored=False, method="random", n_samples=200, grid=None,
+                              workers=None, offline=False):
+    """
+    Walk-forward su più simboli: ottimizza i parametri su ogni finestra in-sample (train_days)
+    e li valuta sulla finestra out-of-sample successiva (test_days), in parallelo.
+    """
+    import parameter_sweep
+    import walk_forward
+    interval = interval or INTERVAL
+    bars_per_day = periods_per_year(interval) / 365
+    frames = load_frames(symbols or symbols_config.SYMBOLS, interval, lookback_days, offline)
+    if not frames:
+        return {}
+    param_sets = parameter_sweep.build_param_sets(grid, method=method, n_samples=n_samples)
+    results = walk_forward.run_walk_forward(frames, param_sets, int(train_days * bars_per_day),
+                                            int(test_days * bars_per_day), anchored=anchored, workers=workers,
+                                            periods=periods_per_year(interval))
+    for symbol, result in results.items():
+        print(f"{symbol}: {len(result['folds'])} fold, rendimento out-of-sample {result['oos_return_pct']:.2f}%")
+    return results
+
+def run_portfolio_backtest(symbols=None, interval=None, lookback_days=LOOKBACK_DAYS, params=None,
+                           initial_balances=None, offline=False):
+    """
+    Backtest di portafoglio: tutti i simboli insieme, con i saldi USDT/USDC/BTC condivisi.
+    """
+    import portfolio_backtest
+    interval = interval or INTERVAL
+    frames = load_frames(symbols or symbols_config.SYMBOLS, interval, lookback_days, offline)
+    if not frames:
+        return None
+    result = portfolio_backtest.run_portfolio_backtest(frames, params or BACKTEST_PARAMS, interval, initial_balances,
+                                                       COMMISSION_RATE, SLIPPAGE_RATE, periods_per_year(interval))
+    for quote, m in result["metrics"].items():
+        print(f"Portafoglio {quote}: rendimento {m['total_return_pct']:.2f}% | Sharpe {m['sharpe']:.2f} | "
+              f"Max DD {m['max_drawdown_pct']:.2f}% | Trade {m['trades']}")
+    return result
+
+def monte_carlo_robustness(symbol=None, interval=None, params=None, lookback_days=LOOKBACK_DAYS, n_runs=2000,
+                           seed=42, block_length=None, jitter=0.5, workers=None, offline=False):
+    """
+    Robustezza Monte Carlo prima di promuovere nuovi parametri: bootstrap dei trade,
+    block bootstrap dei rendimenti e jitter dei costi su n_runs simulazioni in parallelo.
+    Restituisce le distribuzioni percentili di rendimento e drawdown (riproducibili con lo stesso seed).
+    block_length: default una settimana di candele.
+    """
+    if n_runs < 1:
+        raise ValueError(f"n_runs deve essere almeno 1 (ricevuto {n_runs})")
+    import monte_carlo
+    symbol = symbol or symbols_config.SYMBOLS[0]
+    interval = interval or INTERVAL
+    df = get_historical_data(symbol, interval, lookback_days, offline)
+    if df.empty:
+        print(f"Nessun dato storico disponibile per {symbol}.")
+        return None
+    data = cached_compute_indicators(df, params or BACKTEST_PARAMS, symbol, interval, columns=SIGNAL_COLUMNS)
+    entry_idx, exit_idx = pair_trades(*data_masks(data))
+    panel = monte_carlo.build_panel(data["Close"].to_numpy(dtype=np.float64), entry_idx, exit_idx)
+    block_length = block_length or max(1, int(periods_per_year(interval) / 52))
+    distribution = monte_carlo.run_monte_carlo(panel, n_runs, seed, block_length, COMMISSION_RATE, SLIPPAGE_RATE,
+                                               jitter, workers)
+    for key, values in distribution.items():
+        print(f"{symbol} {key}: " + " | ".join(f"p{p}: {v:.2f}" for p, v in values.items()))
+    return distribution
+
+def plugin_masks(data, entry, exit_, plugin, threshold=ML_OVERRIDE_CONFIDENCE):
+    """
+    Applica il plugin a tutte le candele con una sola chiamata (analyze_batch) e combina
+    i segnali come SingleBot.run: un segnale ML diverso con confidenza > threshold sostituisce
+    quello base. analyze_batch non modifica il feature store e valuta solo le candele successive
+    alla finestra di addestramento del modello (nelle altre il plugin non prevale mai).
+    Restituisce (entry, exit, numero di candele in cui il plugin prevale).
+    """
+    if not hasattr(plugin, "analyze_batch"):
+        return entry, exit_, 0
+    signals, confidence = plugin.analyze_batch(data)
+    strong = confidence > threshold
+    ml_buy = strong & (signals == "buy")
+    ml_sell = strong & (signals == "sell")
+    entry = ml_buy | (entry & ~strong)
+    exit_ = ml_sell | (exit_ & ~strong)
+    entry[0] = exit_[0] = False
+    return entry, exit_, int(strong.sum())
+
+def backtest_symbol(symbol, interval, plugin=None, params=None, lookback_days=LOOKBACK_DAYS):
+    """
+    Backtest rapido di un simbolo: candele dall'archivio locale (download solo se assente),
+    indicatori in cache, motore vettorializzato e plugin consultato in batch.
+    """
+    t0 = time.perf_counter()
+    df = get_historical_data(symbol, interval, lookback_days, offline=True)
+    if df.empty:
+        df = get_historical_data(symbol, interval, lookback_days)
+    if df.empty:
+        return None
+    # Stessi parametri del Backtester: velocità e parità confrontano la stessa strategia
+    params = params or BACKTEST_PARAMS
+    periods = periods_per_year(interval)
+    # Il risultato con plugin dipende anche dal modello: si mette in cache solo quello senza plugin
+    fingerprint = data_fingerprint(df, interval) if plugin is None else None
+    key = result_key(params, cost_settings(periods=periods))
+    if fingerprint:
+        cached, found = backtest_cache.get_many(fingerprint, [key])
+        if found[0]:
+            return dict({f: cached[0][f].item() for f in METRICS_DTYPE.names}, symbol=symbol, interval=interval,
+                        candles=len(df), ml_overrides=0, elapsed_s=time.perf_counter() - t0, cached=True)
+    data = cached_compute_indicators(df, params, symbol, interval)
+    entry, exit_ = data_masks(data)
+    overrides = 0
+    if plugin is not None:
+        entry, exit_, overrides = plugin_masks(data, entry, exit_, plugin)
+    entry_idx, exit_idx = pair_trades(entry, exit_)
+    result = evaluate_trades(data["Close"].to_numpy(dtype=np.float64), entry_idx, exit_idx,
+                             COMMISSION_RATE, SLIPPAGE_RATE, INITIAL_CAPITAL, periods)
+    if fingerprint:
+        backtest_cache.put_many(fingerprint, [key], np.atleast_1d(result.metrics))
+        backtest_cache.flush()
+    return dict(result.as_dict(), symbol=symbol, interval=interval, candles=len(data),
+                ml_overrides=overrides, elapsed_s=time.perf_counter() - t0, cached=False)
+
+_backtest_executor = None
+_backtest_lock = Lock()
+_backtest_results = {}
+
+def _get_backtest_executor():
+    global _backtest_executor
+    with _backtest_lock:
+        if _backtest_executor is None:
+            _backtest_executor = ThreadPoolExecutor(max_workers=BACKTEST_WORKERS, thread_name_prefix="backtest")
+        return _backtest_executor
+
+def run_backtest(symbol, interval, plugin=None, params=None, on_done=None):
+    """
+    Avvia il backtest in background e ritorna subito un Future.
+    Al termine il risultato è pubblicato (get_backtest_result) e passato a on_done, se indicato.
+    """
+    def job():
+        try:
+            result = backtest_symbol(symbol, interval, plugin, params)
+        except Exception as e:
+            print(f"[backtesting_engine] Errore nel backtest di {symbol} {interval}: {e}")
+            result = None
+        with _backtest_lock:
+            _backtest_results[(symbol, interval)] = result
+        if on_done:
+            on_done(result)
+        return result
+    return _get_backtest_executor().submit(job)
+
+def get_backtest_result(symbol, interval):
+    """
+    Ultimo risultato pubblicato per (simbolo, intervallo), None se non ancora disponibile.
+    """
+    with _backtest_lock:
+        return _backtest_results.get((symbol, interval))
 
 class Backtester:
     def __init__(self, symbol=None, interval=None, lookback=5000):
         self.symbol = symbol if symbol is not None else symbols_config.SYMBOLS[0]
         self.interval = interval if interval is not None else INTERVAL
         self.lookback = lookback
+        self.result = None
 
-    def run_backtest(self):
+    def run_backtest(self, plot=True, offline=False):
         print(f"Eseguo backtest per {self.symbol} su intervallo {self.interval}...")
-        df = get_historical_data(self.symbol, self.interval, LOOKBACK_DAYS)
+        df = get_historical_data(self.symbol, self.interval, LOOKBACK_DAYS, offline)
         if df.empty:
             print("Nessun dato storico disponibile.")
             return None
-        df = compute_indicators(df)
+        df = cached_compute_indicators(df, BACKTEST_PARAMS, self.symbol, self.interval)
         trades = simulate_strategy(df)
-        analyze_and_plot(self.symbol, df, trades)
+        self.result = evaluate_data(df, self.interval)
+        print(self.result.summary())
+        if plot:
+            analyze_and_plot(self.symbol, df, trades)
         return trades
 
+    def run_walk_forward(self, train_days=180, test_days=30, anchored=False, **kwargs):
+        """
+        Modalità walk-forward per il simbolo del Backtester (fold rolling o anchored).
+        """
+        results = walk_forward_optimization([self.symbol], self.interval, train_days=train_days,
+                                            test_days=test_days, anchored=anchored, **kwargs)
+        return results.get(self.symbol)
+
 if __name__ == "__main__":
     bt = Backtester()
     bt.run_backtest()
@@ -3,6 +3,7 @@
 binance_websocket.py
 
 Gestisce la connessione WebSocket a Binance per dati di mercato e ordini.
+Oltre ai ticker, sottoscrive gli stream kline dei bot attivi e alimenta le finestre di live_candles.
 """
 
 import asyncio
@@ -16,17 +17,31 @@ from binance.client import Client
 from telegram_notifications import send_telegram_message
 import symbols_config
 from logging_system import log_order_event, log_websocket_event, log_error
+from bot_registry import active_bots, active_bots_lock
+from live_candles import process_kline_event, mark_unsynced, mark_all_unsynced
 
 telegram_message_sent = False
 client = Client(API_KEY, API_SECRET, testnet=USE_TESTNET)
 latest_prices = {}
 current_symbols = symbols_config.SYMBOLS.copy()
+current_kline_streams = set()
 logging.basicConfig(level=logging.INFO)
 
 def get_latest_price(symbol):
     return latest_prices.get(symbol.upper(), None)
 
+def get_kline_streams():
+    """
+    Stream kline richiesti dai bot attivi: <symbol>@kline_<interval> per il timeframe di ciascun bot.
+    """
+    with active_bots_lock:
+        bots = list(active_bots.items())
+    return {f"{symbol.lower()}@kline_{bot.interval}" for symbol, bot in bots if getattr(bot, "interval", None)}
+
 async def process_websocket_data(data):
+    if data.get("e") == "kline" and "k" in data:
+        process_kline_event(data)
+        return
     if "s" in data and "c" in data:
         symbol = data["s"]
         import importlib
@@ -68,8 +83,29 @@ async def unsubscribe_symbols(websocket, symbols_to_unsubscribe):
     await websocket.send(json.dumps(unsubscribe_message))
     log_websocket_event(f"Richiesta UNSUBSCRIBE per: {symbols_to_unsubscribe}")
 
+async def subscribe_kline_streams(websocket, streams):
+    subscribe_message = {
+        "method": "SUBSCRIBE",
+        "params": sorted(streams),
+        "id": 300
+    }
+    await websocket.send(json.dumps(subscribe_message))
+    log_websocket_event(f"Sottoscrizione kline per: {sorted(streams)}")
+
+async def unsubscribe_kline_streams(websocket, streams):
+    unsubscribe_message = {
+        "method": "UNSUBSCRIBE",
+        "params": sorted(streams),
+        "id": 400
+    }
+    await websocket.send(json.dumps(unsubscribe_message))
+    for stream in streams:
+        symbol, interval = stream.split("@kline_")
+        mark_unsynced(symbol, interval)
+    log_websocket_event(f"Richiesta UNSUBSCRIBE kline per: {sorted(streams)}")
+
 async def connect_to_binance():
-    global current_symbols, telegram_message_sent
+    global current_symbols, current_kline_streams, telegram_message_sent
     uri = "wss://stream.binance.com:9443/ws"
     ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
     ssl_context.load_verify_locations(certifi.where())
@@ -82,6 +118,9 @@ async def connect_to_binance():
             full_uri = f"{uri}/{streams}"
             async with websockets.connect(full_uri, ssl=ssl_context) as websocket:
                 log_websocket_event("Connessione WebSocket Binance stabilita.")
+                # Le candele arrivate durante la disconnessione vanno recuperate via REST
+                mark_all_unsynced()
+                current_kline_streams = set()
                 subscribe_message = {
                     "method": "SUBSCRIBE",
                     "params": [f"{symbol.lower()}@ticker" for symbol in current_symbols],
@@ -105,6 +144,12 @@ async def connect_to_binance():
                     if removed_symbols:
                         await unsubscribe_symbols(websocket, removed_symbols)
                     current_symbols = new_symbols_list
+                    kline_streams = get_kline_streams()
+                    if kline_streams - current_kline_streams:
+                        await subscribe_kline_streams(websocket, kline_streams - current_kline_streams)
+                    if current_kline_streams - kline_streams:
+                        await unsubscribe_kline_streams(websocket, current_kline_streams - kline_streams)
+                    current_kline_streams = kline_streams
                     response = await websocket.recv()
                     data = json.loads(response)
                     await process_data_with_retry(data)
@@ -9,11 +9,17 @@ RISK_PERCENT = 0.05
 
 INTERVAL = "4h"
 CYCLE_INTERVAL = 3000
+BASE_INTERVAL = "1h"
 
 COMMISSION_RATE = 0.001
 SLIPPAGE_RATE = 0.001
 INITIAL_CAPITAL = 1000.0
 
+KLINE_FETCH_WORKERS = 4
+REQUEST_WEIGHT_LIMIT = 6000
+REQUEST_WEIGHT_SAFETY = 0.8
+LIVE_LOOKBACK_DAYS = 90         # storico della finestra live (esteso per gli intervalli lunghi, vedi ML_FEATURE_WARMUP_BARS)
+
 CHIUDI_ORDINE = "OBV"
 
 TELEGRAM_BOT_NAME = "NEW_BOT_CGPT"
@@ -34,8 +40,50 @@ ADX_WINDOW = 26
 ADX_BUY_THRESHOLD = 20
 ADX_SELL_THRESHOLD = 35
 
-ML_RETRAIN_INTERVAL = 50
-FEATURE_NAMES = ["RSI", "RSI_MA", "OBV", "OBV_MA", "ADX_BUY_THRESHOLD", "ADX_SELL_THRESHOLD", "ADX_WINDOW"]
+INDICATOR_BACKEND = "numpy"  # "numpy" oppure "pandas_ta"
+INDICATOR_PARAMS = {
+    "LC_RSI_NPERIODI": RSI_PERIOD,
+    "LC_RSI_MA_NPERIODI": RSI_MA_SPAN,
+    "FAST_LENGTH": 12,
+    "SLOW_LENGTH": 26,
+    "SIGNAL_LENGTH": 18,
+    "LC_TIPO_MA": "WMA",
+    "LC_MA1_NPERIODI": 5,
+    "LC_MA2_NPERIODI": 10,
+    "LC_MA3_NPERIODI": 60,
+    "LC_MA4_NPERIODI": 223,
+    "MA_TYPE_INPUT": "SMA + Bollinger Bands",
+    "MA_LENGTH_INPUT": BB_WINDOW,
+    "BB_MULT_INPUT": BB_NUM_STD
+}
+
+INDICATOR_CACHE_MAX_MB = 256
+INDICATOR_CACHE_SPILL = True
+INDICATOR_CACHE_DISK_MAX_MB = 1024
+
+BACKTEST_WORKERS = 2
+BACKTEST_CACHE_DISK_MAX_MB = 256
+ML_OVERRIDE_CONFIDENCE = 0.75
+
+ML_RETRAIN_INTERVAL = 50        # trade chiusi tra due retraining
+ML_RETRAIN_CANDLES = 24         # oppure nuove candele tra due retraining
+ML_FULL_RETRAIN_HOURS = 168     # ricerca completa degli iperparametri (GridSearchCV)
+ML_INCREMENTAL_TREES = 20       # alberi aggiunti a ogni retraining incrementale
+ML_INCREMENTAL_MIN_ROWS = 20
+ML_MAX_TREES = 400
+# Candele di riscaldamento degli indicatori per le nuove feature: il feature store aggiunge una candela
+# chiusa solo se la finestra live ne contiene almeno altrettante prima, quindi la finestra live è di
+# almeno ML_FEATURE_WARMUP_BARS + 3 candele (kline_fetcher.live_lookback_days; 1d: ~305 giorni)
+ML_FEATURE_WARMUP_BARS = 300
+ML_FEATURE_STORE_MAX_ROWS = 50000
+ML_MODEL_DIR = "models"
+ML_MODEL_CACHE_MAX_MB = 512
+ML_TRAINING_WORKERS = 1
+ML_TRAINING_RETRY_MINUTES = 30   # attesa prima di ritentare un primo addestramento non riuscito
+FEATURE_SET_VERSION = "v2"
+# Colonne di indicator_graph usate come feature ML (vedi feature_pipeline); cambiandole va
+# incrementato FEATURE_SET_VERSION
+FEATURE_NAMES = ["RSI", "RSI_MA", "OBV", "OBV_MA", "MACD", "ATR", "BB_WIDTH"]
 
 from symbols_config import SYMBOLS
 
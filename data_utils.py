@@ -3,38 +3,72 @@
 data_utils.py
 
 Funzioni per:
-- Recupero dati storici da Binance.
-- Calcolo degli indicatori tecnici.
+- Recupero dati storici da Binance (con archivio locale incrementale).
+- Calcolo degli indicatori tecnici (backend NumPy o pandas_ta).
 """
 
-import pandas as pd
 import numpy as np
-np.NaN = np.nan
-import pandas_ta as ta
-from datetime import datetime, timedelta
+import indicator_graph
+from datetime import datetime, timedelta, timezone
+from kline_store import columns_to_frame, load_columns
+from resampler import get_columns, get_derived_columns, can_derive
+from config import INDICATOR_BACKEND, BASE_INTERVAL
 
 def get_historical_data(client, symbol, interval, lookback_days=90):
+    """
+    Restituisce le candele degli ultimi lookback_days giorni.
+    I dati sono letti dall'archivio locale (kline_store); da Binance vengono
+    scaricate solo le candele successive all'ultima salvata. I timeframe multipli
+    di BASE_INTERVAL sono ricavati per resampling dalla serie base.
+    """
     end_time = datetime.utcnow()
     start_time = end_time - timedelta(days=lookback_days)
-    start_str = start_time.strftime("%d %b %Y")
-    print(f"Scaricando dati per {symbol} dal {start_str}...")
-    klines = client.get_historical_klines(symbol, interval, start_str)
-    if not klines:
-        return pd.DataFrame()
-    df = pd.DataFrame(klines, columns=[
-        "Open Time", "Open", "High", "Low", "Close", "Volume",
-        "Close Time", "Quote Asset Volume", "Number of Trades",
-        "Taker Buy Base Asset Volume", "Taker Buy Quote Asset Volume", "Ignore"
-    ])
-    df["Open Time"] = pd.to_datetime(df["Open Time"], unit='ms')
-    df["Close Time"] = pd.to_datetime(df["Close Time"], unit='ms')
-    for col in ["Open", "High", "Low", "Close", "Volume"]:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    df.set_index("Open Time", inplace=True)
-    df = df[["Open", "High", "Low", "Close", "Volume"]]
-    return df
+    start_ms = int(start_time.replace(tzinfo=timezone.utc).timestamp() * 1000)
+    print(f"Aggiornamento dati per {symbol} dal {start_time.strftime('%d %b %Y')}...")
+    columns = get_columns(client, symbol, interval, start_ms)
+    return columns_to_frame(columns, start_ms)
 
-def compute_indicators(data, params):
+def get_local_data(symbol, interval, lookback_days=90):
+    """
+    Come get_historical_data ma senza rete: usa solo l'archivio locale (kline_store),
+    ricavando per resampling i timeframe multipli di BASE_INTERVAL.
+    """
+    start_ms = int((datetime.now(timezone.utc) - timedelta(days=lookback_days)).timestamp() * 1000)
+    if interval == BASE_INTERVAL or not can_derive(interval):
+        columns = load_columns(symbol, interval)
+    else:
+        columns = get_derived_columns(symbol, interval, load_columns(symbol, BASE_INTERVAL))
+    return columns_to_frame(columns, start_ms)
+
+def _load_pandas_ta():
+    # pandas_ta usa ancora np.NaN, rimosso in NumPy 2: import solo se serve
+    np.NaN = np.nan
+    import pandas_ta as ta
+    return ta
+
+def compute_indicators(data, params, backend=None, columns=None):
+    """
+    Calcola gli indicatori della strategia.
+    backend: "numpy" (kernel di indicators.py) o "pandas_ta"; default config.INDICATOR_BACKEND.
+    columns: con il backend NumPy calcola solo queste colonne (e le loro dipendenze),
+    vedi indicator_graph. Il backend pandas_ta calcola sempre tutte le colonne.
+    """
+    backend = backend or INDICATOR_BACKEND
+    if backend == "pandas_ta":
+        return _compute_indicators_pandas_ta(data, params)
+    if backend != "numpy":
+        raise ValueError(f"Backend indicatori non supportato: {backend}")
+    return indicator_graph.evaluate(data, params, columns)
+
+def compute_indicators_batch(data, param_sets, columns=None):
+    """
+    Indicatori per una lista di insiemi di parametri sulla stessa serie:
+    {colonna: array 2-D (insieme x tempo)}, con i calcoli comuni condivisi (vedi indicator_graph).
+    """
+    return indicator_graph.evaluate_batch(data, param_sets, columns)
+
+def _compute_indicators_pandas_ta(data, params):
+    ta = _load_pandas_ta()
     data["OBV"] = ta.obv(data["Close"], data["Volume"])
     try:
         print("[data_utils] Calcolo OBV_MA...")
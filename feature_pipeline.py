@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+feature_pipeline.py
+
+Pipeline delle feature del modello ML e archivio delle matrici calcolate:
+- Le feature sono colonne del grafo degli indicatori (indicator_graph) elencate in
+  config.FEATURE_NAMES, calcolate con parametri fissi (INDICATOR_PARAMS) e non con quelli
+  dinamici del bot: training, backtest e inferenza usano la stessa trasformazione.
+- Per ogni (simbolo, intervallo) le feature delle candele chiuse sono salvate a colonne in un
+  file npz per versione del set di feature; a ogni ciclo sono calcolate solo le righe nuove
+  (più ML_FEATURE_WARMUP_BARS candele di riscaldamento). L'archivio cresce soltanto: un frame
+  più corto dell'intervallo salvato non lo ricalcola né lo sovrascrive.
+- Le feature cumulative (OBV, OBV_MA) dipendono dall'inizio della serie: i valori calcolati
+  su una coda sono agganciati all'ultimo valore salvato.
+- live_path_check() verifica il percorso live su candele sintetiche
+  (python feature_pipeline.py).
+"""
+
+import os
+import tempfile
+import time
+from threading import Lock
+import numpy as np
+import indicator_graph
+from kline_store import interval_to_ms
+from config import (FEATURE_NAMES, INDICATOR_PARAMS, FEATURE_SET_VERSION, ML_FEATURE_WARMUP_BARS,
+                    ML_FEATURE_STORE_MAX_ROWS)
+
+FEATURE_STORE_DIR = "data/feature_store"
+ANCHORED_FEATURES = {"OBV", "OBV_MA"}
+
+def _open_ms(df):
+    return df.index.values.astype("datetime64[ms]").astype(np.int64)
+
+class FeaturePipeline:
+    def __init__(self, feature_names=FEATURE_NAMES, params=None, version=FEATURE_SET_VERSION,
+                 warmup=ML_FEATURE_WARMUP_BARS):
+        missing = [name for name in feature_names if name not in indicator_graph.NODES]
+        if missing:
+            raise ValueError(f"Feature non presenti nel grafo degli indicatori: {missing}")
+        self.feature_names = list(feature_names)
+        self.params = dict(params or INDICATOR_PARAMS)
+        self.version = version
+        self.warmup = warmup
+        self.anchored = np.array([name in ANCHORED_FEATURES for name in self.feature_names])
+
+    def transform(self, df):
+        """
+        Matrice (candele x feature) di un DataFrame OHLCV.
+        """
+        data = indicator_graph.evaluate(df[indicator_graph.SOURCE_COLUMNS].copy(), self.params, self.feature_names)
+        return data[self.feature_names].to_numpy(dtype=np.float64)
+
+    def anchored_transform(self, df, ref_pos=None, ref_values=None):
+        """
+        Come transform, con le feature cumulative spostate in modo che la riga ref_pos valga ref_values.
+        """
+        X = self.transform(df)
+        if ref_pos is not None and self.anchored.any():
+            X[:, self.anchored] += ref_values[self.anchored] - X[ref_pos, self.anchored]
+        return X
+
+def _concat(first, second):
+    return {name: np.concatenate([first[name], second[name]]) for name in first}
+
+def _empty_entry(n_features):
+    return {"open_ms": np.empty(0, dtype=np.int64), "close": np.empty(0), "X": np.empty((0, n_features))}
+
+class FeatureStore:
+    def __init__(self, pipeline=None, store_dir=FEATURE_STORE_DIR, max_rows=ML_FEATURE_STORE_MAX_ROWS):
+        self.pipeline = pipeline or FeaturePipeline()
+        self.store_dir = store_dir
+        self.max_rows = max_rows
+        self.entries = {}
+        self.lock = Lock()
+        self.stats = {"rows_computed": 0, "rows_reused": 0, "rebuilds": 0, "disk_loads": 0}
+
+    def _path(self, symbol, interval):
+        return os.path.join(self.store_dir, self.pipeline.version, f"{symbol}_{interval}.npz")
+
+    def _entry(self, symbol, interval):
+        entry = self.entries.get((symbol, interval))
+        if entry is None:
+            entry = _empty_entry(len(self.pipeline.feature_names))
+            path = self._path(symbol, interval)
+            if os.path.exists(path):
+                try:
+                    with np.load(path) as npz:
+                        entry = {"open_ms": npz["open_ms"], "close": npz["close"],
+                                 "X": np.column_stack([npz[name] for name in self.pipeline.feature_names])}
+                    self.stats["disk_loads"] += 1
+                except Exception as e:
+                    print(f"[feature_pipeline] Errore lettura {path}: {e}")
+            self.entries[(symbol, interval)] = entry
+        return entry
+
+    def _save(self, symbol, interval, entry):
+        path = self._path(symbol, interval)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Nome univoco: anche i processi di addestramento (ml_strategy) salvano questo archivio
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez(f, open_ms=entry["open_ms"], close=entry["close"],
+                             **{name: entry["X"][:, i] for i, name in enumerate(self.pipeline.feature_names)})
+                os.replace(tmp_path, path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            print(f"[feature_pipeline] Errore scrittura {path}: {e}")
+
+    def update(self, symbol, interval, df, now_ms=None):
+        """
+        Aggiunge all'archivio le feature delle candele chiuse di df. L'archivio cresce soltanto:
+        le candele nuove sono aggiunte in coda (servono ML_FEATURE_WARMUP_BARS candele di
+        contesto in df) e quelle precedenti all'inizio in testa; le righe già salvate non sono
+        mai ricalcolate. Un df che non contiene l'ultima candela salvata sostituisce l'archivio
+        solo se ha almeno altrettante candele chiuse (archivio vuoto: più di ML_FEATURE_WARMUP_BARS).
+        now_ms: istante usato per riconoscere le candele chiuse (default: ora).
+        Restituisce l'entry {"open_ms", "close", "X"}.
+        """
+        symbol = symbol.upper()
+        if df is None or df.empty:
+            return self.get(symbol, interval)
+        open_ms = _open_ms(df)
+        now_ms = time.time() * 1000 if now_ms is None else now_ms
+        closed = open_ms + interval_to_ms(interval) <= now_ms
+        close = df["Close"].to_numpy(dtype=np.float64)
+        warmup = self.pipeline.warmup
+        with self.lock:
+            entry = self._entry(symbol, interval)
+            stored = entry["open_ms"]
+            n_closed = int(closed.sum())
+            if not n_closed:
+                return entry
+            if not len(stored) or not (open_ms == stored[-1]).any():
+                # Mai sostituire l'archivio con un df più corto o non più recente
+                if n_closed <= warmup or n_closed < len(stored) or (len(stored) and open_ms[closed][-1] <= stored[-1]):
+                    return entry
+                if len(stored):
+                    self.stats["rebuilds"] += 1
+                    print(f"[feature_pipeline] {symbol} {interval}: archivio non contiguo, ricostruito da {n_closed} candele.")
+                updated = {"open_ms": open_ms[closed], "close": close[closed], "X": self.pipeline.transform(df)[closed]}
+                added = n_closed
+            else:
+                updated, added = entry, 0
+                ref = int(np.searchsorted(open_ms, stored[-1]))
+                tail = closed & (open_ms > stored[-1])
+                if tail.any() and ref >= warmup:
+                    start = ref - warmup
+                    X = self.pipeline.anchored_transform(df.iloc[start:], warmup, entry["X"][-1])[tail[start:]]
+                    updated = _concat(updated, {"open_ms": open_ms[tail], "close": close[tail], "X": X})
+                    added += int(tail.sum())
+                head = closed & (open_ms < stored[0])
+                if head.any() and len(stored) > warmup:
+                    # Aggancio su una riga salvata già riscaldata
+                    pos = int(np.searchsorted(open_ms, stored[warmup]))
+                    if pos < len(open_ms) and open_ms[pos] == stored[warmup]:
+                        X = self.pipeline.anchored_transform(df.iloc[:pos + 1], pos, entry["X"][warmup])[head[:pos + 1]]
+                        updated = _concat({"open_ms": open_ms[head], "close": close[head], "X": X}, updated)
+                        added += int(head.sum())
+                if not added:
+                    return entry
+            entry = {name: values[-self.max_rows:] for name, values in updated.items()}
+            self.entries[(symbol, interval)] = entry
+            self.stats["rows_computed"] += added
+            self._save(symbol, interval, entry)
+        return entry
+
+    def get(self, symbol, interval):
+        with self.lock:
+            return self._entry(symbol.upper(), interval)
+
+    def reload(self, symbol, interval):
+        """
+        Scarta l'entry in memoria: la prossima lettura usa il file scritto da un altro processo.
+        Le candele più recenti mancanti sono riaggiunte dal successivo update.
+        """
+        with self.lock:
+            self.entries.pop((symbol.upper(), interval), None)
+
+    def features(self, symbol, interval, df, update=True, now_ms=None):
+        """
+        Matrice delle feature allineata alle righe di df: righe già salvate lette dall'archivio,
+        le altre (es. la candela in formazione) calcolate sulla coda e agganciate.
+        Sul percorso live df è l'intera finestra OHLCV del bot (vedi update).
+        update=False (backtest): sola lettura, l'archivio non viene modificato né salvato.
+        """
+        entry = self.update(symbol, interval, df, now_ms) if update else self.get(symbol, interval)
+        open_ms = _open_ms(df)
+        stored_ms, stored_X = entry["open_ms"], entry["X"]
+        X = np.empty((len(df), len(self.pipeline.feature_names)))
+        if len(stored_ms):
+            pos = np.minimum(np.searchsorted(stored_ms, open_ms), len(stored_ms) - 1)
+            found = stored_ms[pos] == open_ms
+            X[found] = stored_X[pos[found]]
+        else:
+            pos, found = np.zeros(len(df), dtype=np.int64), np.zeros(len(df), dtype=bool)
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            start = max(0, int(missing[0]) - self.pipeline.warmup)
+            found_tail = np.flatnonzero(found[start:])
+            if len(found_tail):
+                ref = int(found_tail[-1])
+                tail = self.pipeline.anchored_transform(df.iloc[start:], ref, stored_X[pos[start + ref]])
+            else:
+                tail = self.pipeline.transform(df.iloc[start:])
+            X[missing] = tail[missing - start]
+        with self.lock:
+            self.stats["rows_reused"] += int(found.sum())
+            self.stats["rows_computed"] += len(missing)
+        return X
+
+    def dataset(self, symbol, interval, since_ms=None):
+        """
+        (X, y, open time in ms) delle candele salvate con target noto (chiusura successiva più alta);
+        con since_ms solo quelle successive.
+        """
+        entry = self.get(symbol, interval)
+        X, close, open_ms = entry["X"][:-1], entry["close"], entry["open_ms"][:-1]
+        y = (close[1:] > close[:-1]).astype(np.int8)
+        keep = ~np.isnan(X).any(axis=1)
+        if since_ms is not None:
+            keep &= open_ms > since_ms
+        return X[keep], y[keep], open_ms[keep]
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.stats, series={f"{s}_{i}": len(e["open_ms"]) for (s, i), e in self.entries.items()})
+
+feature_store = FeatureStore()
+
+def live_path_check(n=1000, interval="1h", seed=0):
+    """
+    Verifica del percorso live (MLStrategy.feature_row -> FeatureStore.features) su candele
+    sintetiche e un archivio temporaneo: alla chiusura di una candela l'archivio cresce di una
+    riga, la riga della candela in formazione è finita e un frame di 2 candele (come quello di
+    IndicatorEngine.compute) non modifica né l'archivio né il file su disco.
+    """
+    import tempfile
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    step = interval_to_ms(interval)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, n + 1))
+    frame = pd.DataFrame({
+        "Open": np.r_[close[0], close[:-1]], "High": close + rng.uniform(0, 1, n + 1),
+        "Low": close - rng.uniform(0, 1, n + 1), "Close": close, "Volume": rng.uniform(1, 100, n + 1)
+    }, index=pd.DatetimeIndex(pd.to_datetime(np.arange(n + 1) * step, unit="ms"), name="Open Time"))
+    open_ms = _open_ms(frame)
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = FeatureStore(store_dir=store_dir)
+        # Finestra live con l'ultima candela in formazione
+        now = open_ms[n - 1] + step // 2
+        store.features("TEST", interval, frame.iloc[:n], now_ms=now)
+        rows = len(store.get("TEST", interval)["open_ms"])
+        # La candela si chiude e la finestra scorre di una posizione
+        now += step
+        X = store.features("TEST", interval, frame.iloc[1:n + 1], now_ms=now)
+        grown = len(store.get("TEST", interval)["open_ms"])
+        store.features("TEST", interval, frame.iloc[-2:], now_ms=now + step)
+        after_short = len(store.get("TEST", interval)["open_ms"])
+        on_disk = len(FeatureStore(store_dir=store_dir).get("TEST", interval)["open_ms"])
+    ok = grown == rows + 1 and bool(np.isfinite(X[-1]).all()) and after_short == grown == on_disk
+    print(f"[feature_pipeline] Percorso live {'OK' if ok else 'ERRORE'}: righe {rows} -> {grown}, "
+          f"dopo frame corto {after_short} (disco {on_disk}), ultima riga finita: {bool(np.isfinite(X[-1]).all())}")
+    return ok
+
+def get_feature_store_stats() -> dict:
+    return feature_store.get_stats()
+
+if __name__ == "__main__":
+    assert live_path_check()
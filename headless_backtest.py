@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+headless_backtest.py
+
+Backtest senza interfaccia e senza rete, per job batch:
+- Legge le candele da file locali (CSV, Parquet o npz dell'archivio kline_store)
+  oppure direttamente dall'archivio locale, senza creare client Binance.
+- Esegue il motore vettorializzato con le metriche al netto dei costi.
+- Scrive i risultati in JSON o Parquet; i grafici sono un passo separato e facoltativo
+  (matplotlib importato solo se richiesto, backend Agg).
+
+Uso: python headless_backtest.py BTCUSDT=btc_4h.csv ETHUSDT --interval 4h --output risultati.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from kline_store import STORE_COLUMNS, columns_to_frame
+from strategy_params import INTERVAL, LOOKBACK_DAYS
+
+FRAME_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+def load_candles(path):
+    """
+    Candele OHLCV da file: .npz (formato kline_store), .parquet o .csv.
+    CSV e Parquet devono avere le colonne Open/High/Low/Close/Volume (maiuscole o minuscole)
+    e "Open Time" (o open_time, in millisecondi o come data) come indice o colonna.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".npz":
+        with np.load(path) as npz:
+            return columns_to_frame({col: npz[col] for col in STORE_COLUMNS})
+    if ext == ".parquet":
+        df = pd.read_parquet(path)
+    elif ext == ".csv":
+        df = pd.read_csv(path)
+    else:
+        raise ValueError(f"Formato file non supportato: {path}")
+    df = df.rename(columns={c: c.replace("_", " ").title() for c in df.columns})
+    if "Open Time" in df.columns:
+        times = df["Open Time"]
+        unit = "ms" if pd.api.types.is_numeric_dtype(times) else None
+        df = df.set_index(pd.DatetimeIndex(pd.to_datetime(times, unit=unit), name="Open Time"))
+    return df[FRAME_COLUMNS].astype(np.float64).sort_index()
+
+def backtest_frame(symbol, df, interval, params=None):
+    """
+    Backtest di un singolo DataFrame OHLCV: restituisce (dati con indicatori, trade, BacktestResult).
+    """
+    from backtesting_engine import BACKTEST_PARAMS, evaluate_data
+    from indicator_cache import cached_compute_indicators
+    from vectorized_backtest import simulate_strategy_vectorized
+    data = cached_compute_indicators(df, params or BACKTEST_PARAMS, symbol, interval)
+    trades = simulate_strategy_vectorized(data, verbose=False)
+    return data, trades, evaluate_data(data, interval)
+
+def run_headless(sources: dict, interval=INTERVAL, params=None, lookback_days=LOOKBACK_DAYS,
+                 output=None, plot_dir=None):
+    """
+    sources: {simbolo: percorso file, oppure None per l'archivio locale}.
+    Restituisce {simbolo: {"metrics": {...}, "trades": [...]}} e, se richiesto,
+    lo scrive in output (.json o .parquet) e salva i grafici in plot_dir.
+    """
+    from data_utils import get_local_data
+    results = {}
+    for symbol, path in sources.items():
+        df = load_candles(path) if path else get_local_data(symbol, interval, lookback_days)
+        if df.empty:
+            print(f"[headless_backtest] Nessun dato per {symbol}.")
+            continue
+        t0 = time.perf_counter()
+        data, trades, result = backtest_frame(symbol, df, interval, params)
+        print(f"[headless_backtest] {symbol}: {result.summary()} ({time.perf_counter() - t0:.2f}s)")
+        results[symbol] = {"metrics": result.as_dict(), "trades": trades}
+        if plot_dir:
+            plot_results(symbol, data, trades, plot_dir)
+    if output:
+        write_results(results, output)
+    return results
+
+def write_results(results, output):
+    """
+    JSON: un documento con metriche e trade per simbolo.
+    Parquet: trade in 'output' e metriche in '<nome>_metrics.parquet'.
+    """
+    if output.endswith(".parquet"):
+        trades = pd.DataFrame([dict(trade, Symbol=symbol) for symbol, r in results.items() for trade in r["trades"]])
+        trades.to_parquet(output)
+        metrics = pd.DataFrame({symbol: r["metrics"] for symbol, r in results.items()}).T
+        metrics.to_parquet(output[:-len(".parquet")] + "_metrics.parquet")
+    else:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4, ensure_ascii=False, default=_json_default)
+    print(f"[headless_backtest] Risultati salvati in {output}.")
+
+def _json_default(value):
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Tipo non serializzabile: {type(value)}")
+
+def plot_results(symbol, data, trades, plot_dir):
+    from backtest_plots import analyze_and_plot
+    os.makedirs(plot_dir, exist_ok=True)
+    analyze_and_plot(symbol, data, trades, save_path=os.path.join(plot_dir, f"{symbol}.png"))
+
+def measure_import_time(module="backtesting_engine"):
+    """
+    Tempo di import del modulo in un interprete pulito (secondi).
+    """
+    import subprocess
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest offline senza grafici interattivi")
+    parser.add_argument("sources", nargs="+", help="SIMBOLO=file (csv/parquet/npz) oppure SIMBOLO per l'archivio locale")
+    parser.add_argument("--interval", default=INTERVAL)
+    parser.add_argument("--lookback-days", type=int, default=LOOKBACK_DAYS)
+    parser.add_argument("--output", help="file .json o .parquet")
+    parser.add_argument("--plot-dir", help="salva i grafici PNG in questa cartella")
+    args = parser.parse_args(argv)
+    sources = {}
+    for item in args.sources:
+        symbol, _, path = item.partition("=")
+        sources[symbol.upper()] = path or None
+    run_headless(sources, args.interval, lookback_days=args.lookback_days, output=args.output, plot_dir=args.plot_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+indicator_cache.py
+
+Cache LRU dei risultati di compute_indicators:
+- Chiave: (simbolo, intervallo, backend, hash dei parametri, colonne, impronta della serie).
+- Limite di memoria con eviction LRU e statistiche (hit, miss, eviction, ...).
+- Spill opzionale su disco, così un riavvio riutilizza i risultati già calcolati.
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from threading import Lock
+import numpy as np
+import pandas as pd
+from config import INDICATOR_BACKEND, INDICATOR_CACHE_MAX_MB, INDICATOR_CACHE_SPILL, INDICATOR_CACHE_DISK_MAX_MB
+from data_utils import compute_indicators
+
+INDICATOR_CACHE_DIR = "data/indicator_cache"
+
+def params_hash(params: dict) -> str:
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def series_fingerprint(data) -> str:
+    digest = hashlib.sha1(np.asarray(data.index.values).view(np.int64).tobytes())
+    for col in ["Open", "High", "Low", "Close", "Volume"]:
+        if col in data:
+            digest.update(np.ascontiguousarray(data[col], dtype=np.float64).tobytes())
+    return digest.hexdigest()[:20]
+
+class IndicatorCache:
+    def __init__(self, max_bytes=INDICATOR_CACHE_MAX_MB * 1024 * 1024, spill=INDICATOR_CACHE_SPILL,
+                 disk_max_bytes=INDICATOR_CACHE_DISK_MAX_MB * 1024 * 1024, cache_dir=INDICATOR_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.spill = spill
+        self.disk_max_bytes = disk_max_bytes
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "evicted_bytes": 0, "spills": 0}
+
+    @staticmethod
+    def make_key(symbol, interval, params, data, columns=None, backend=None):
+        """
+        L'impronta copre indice e valori OHLCV di tutte le candele (come backtest_cache):
+        candele intermedie corrette o reintegrate e la candela in formazione aggiornata
+        producono una chiave diversa.
+        """
+        if data.empty:
+            return None
+        return (
+            symbol.upper(), interval, backend or INDICATOR_BACKEND, params_hash(params),
+            tuple(columns) if columns is not None else None,
+            series_fingerprint(data),
+        )
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.pkl")
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self.entries[key].copy()
+        if self.spill:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                try:
+                    df = pd.read_pickle(path)
+                    with self.lock:
+                        self.stats["disk_hits"] += 1
+                    self._store(key, df)
+                    return df.copy()
+                except Exception as e:
+                    print(f"[indicator_cache] Errore lettura {path}: {e}")
+        with self.lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key, df):
+        self._store(key, df.copy())
+        if self.spill:
+            self._spill(key, df)
+
+    def _store(self, key, df):
+        size = int(df.memory_usage(index=True).sum())
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= int(self.entries[key].memory_usage(index=True).sum())
+            self.entries[key] = df
+            self.entries.move_to_end(key)
+            self.bytes += size
+            while self.bytes > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                evicted_size = int(evicted.memory_usage(index=True).sum())
+                self.bytes -= evicted_size
+                self.stats["evictions"] += 1
+                self.stats["evicted_bytes"] += evicted_size
+
+    def _spill(self, key, df):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._disk_path(key)
+            tmp_path = path + ".tmp"
+            df.to_pickle(tmp_path)
+            os.replace(tmp_path, path)
+            with self.lock:
+                self.stats["spills"] += 1
+            self._prune_disk()
+        except Exception as e:
+            print(f"[indicator_cache] Errore scrittura su disco: {e}")
+
+    def _prune_disk(self):
+        files = [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if f.endswith(".pkl")]
+        files.sort(key=os.path.getmtime)
+        total = sum(os.path.getsize(f) for f in files)
+        while files and total > self.disk_max_bytes:
+            oldest = files.pop(0)
+            total -= os.path.getsize(oldest)
+            os.remove(oldest)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries), bytes=self.bytes, max_bytes=self.max_bytes)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+indicator_cache = IndicatorCache()
+
+def cached_compute_indicators(data, params, symbol, interval, columns=None):
+    """
+    compute_indicators con cache: restituisce il risultato memorizzato se la stessa serie
+    è già stata elaborata con gli stessi parametri.
+    """
+    key = IndicatorCache.make_key(symbol, interval, params, data, columns)
+    if key is None:
+        return compute_indicators(data, params, columns=columns)
+    cached = indicator_cache.get(key)
+    if cached is not None:
+        return cached
+    result = compute_indicators(data, params, columns=columns)
+    indicator_cache.put(key, result)
+    return result
+
+def get_cache_stats() -> dict:
+    return indicator_cache.get_stats()
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+indicator_engine.py
+
+Motore incrementale degli indicatori per il percorso live:
+- Un'istanza per bot, con stato interno aggiornato in O(1) a ogni candela chiusa
+  (ricorsioni EMA/RSI, OBV cumulato, ring buffer per WMA/SMA, varianza mobile per le bande).
+- La candela in formazione viene calcolata in anteprima senza modificare lo stato: si salvano
+  gli accumulatori scalari, si applica la candela e li si ripristina (le finestre mobili perdono
+  solo l'ultimo valore aggiunto e riprendono il più vecchio), senza copiare i buffer.
+- Riproduce le colonne di data_utils.compute_indicators (stessa semantica di pandas_ta).
+"""
+
+import math
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+
+NAN = float("nan")
+
+class _Ewm:
+    """
+    Stessa ricorsione di pandas Series.ewm(...).mean() (ignore_na=False).
+    """
+
+    def __init__(self, alpha, adjust=False, min_periods=0):
+        self.old_wt_factor = 1.0 - alpha
+        self.new_wt = 1.0 if adjust else alpha
+        self.adjust = adjust
+        self.min_periods = max(min_periods, 1)
+        self.weighted = NAN
+        self.old_wt = 1.0
+        self.nobs = 0
+
+    def update(self, x):
+        is_obs = x == x
+        self.nobs += is_obs
+        if self.weighted == self.weighted:
+            self.old_wt *= self.old_wt_factor
+            if is_obs:
+                if self.weighted != x:
+                    self.weighted = (self.old_wt * self.weighted + self.new_wt * x) / (self.old_wt + self.new_wt)
+                if self.adjust:
+                    self.old_wt += self.new_wt
+                else:
+                    self.old_wt = 1.0
+        elif is_obs:
+            self.weighted = x
+        return self.weighted if self.nobs >= self.min_periods else NAN
+
+    def save(self):
+        return self.weighted, self.old_wt, self.nobs
+
+    def restore(self, saved):
+        self.weighted, self.old_wt, self.nobs = saved
+
+class _Ema:
+    """
+    EMA di pandas_ta (presma): seme = media dei primi 'length' valori, poi ewm(span, adjust=False).
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.count = 0
+        self.head = []
+        self.ewm = _Ewm(2.0 / (length + 1))
+
+    def update(self, x):
+        self.count += 1
+        if self.count < self.length:
+            self.head.append(x)
+            return self.ewm.update(NAN)
+        if self.count == self.length:
+            self.head.append(x)
+            valid = [v for v in self.head if v == v]
+            self.head = None
+            return self.ewm.update(sum(valid) / len(valid) if valid else NAN)
+        return self.ewm.update(x)
+
+    def save(self):
+        return self.count, self.head, len(self.head) if self.head is not None else 0, self.ewm.save()
+
+    def restore(self, saved):
+        self.count, self.head, size, ewm = saved
+        if self.head is not None:
+            del self.head[size:]
+        self.ewm.restore(ewm)
+
+class _Rolling:
+    """
+    Finestra mobile a ring buffer con somme aggiornate in O(1):
+    media, media pesata lineare (WMA) e deviazione standard (ddof=1).
+    Le somme vengono ricalcolate esattamente ogni 'length' aggiornamenti per limitare la deriva numerica.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.buffer = deque(maxlen=length)
+        self.shift = 0.0
+        self.sum = 0.0
+        self.shifted_sum = 0.0
+        self.shifted_sumsq = 0.0
+        self.wsum = 0.0
+        self.since_resync = 0
+
+    def _resync(self):
+        values = np.fromiter(self.buffer, dtype=np.float64, count=len(self.buffer))
+        self.shift = float(values.mean())
+        shifted = values - self.shift
+        self.sum = float(values.sum())
+        self.shifted_sum = float(shifted.sum())
+        self.shifted_sumsq = float(np.dot(shifted, shifted))
+        self.wsum = float(np.dot(values, np.arange(1, len(values) + 1)))
+        self.since_resync = 0
+
+    def update(self, x):
+        if len(self.buffer) < self.length:
+            self.buffer.append(x)
+            if len(self.buffer) == self.length:
+                self._resync()
+            return
+        old = self.buffer[0]
+        self.buffer.append(x)
+        self.wsum += self.length * x - self.sum
+        self.sum += x - old
+        self.shifted_sum += x - old
+        self.shifted_sumsq += (x - self.shift) ** 2 - (old - self.shift) ** 2
+        self.since_resync += 1
+        if self.since_resync >= self.length:
+            self._resync()
+
+    def save(self):
+        return (self.shift, self.sum, self.shifted_sum, self.shifted_sumsq, self.wsum, self.since_resync,
+                self.buffer[0] if self.full else None)
+
+    def restore(self, saved):
+        # Annulla un solo update: toglie il valore aggiunto e, se la finestra era piena, rimette il più vecchio
+        self.shift, self.sum, self.shifted_sum, self.shifted_sumsq, self.wsum, self.since_resync, old = saved
+        self.buffer.pop()
+        if old is not None:
+            self.buffer.appendleft(old)
+
+    @property
+    def full(self):
+        return len(self.buffer) == self.length
+
+    def mean(self):
+        return self.sum / self.length if self.full else NAN
+
+    def total(self):
+        return self.sum if self.full else NAN
+
+    def wma(self):
+        return self.wsum / (0.5 * self.length * (self.length + 1)) if self.full else NAN
+
+    def std(self):
+        if not self.full or self.length < 2:
+            return NAN
+        var = (self.shifted_sumsq - self.shifted_sum ** 2 / self.length) / (self.length - 1)
+        return math.sqrt(var) if var > 0 else 0.0
+
+class _MovingAverage:
+    """
+    Media mobile di tipo EMA, SMA o WMA (come ta.ema / ta.sma / ta.wma).
+    """
+
+    def __init__(self, kind, length):
+        self.kind = kind
+        self.impl = _Ema(length) if kind == "EMA" else _Rolling(length)
+
+    def update(self, x):
+        if self.kind == "EMA":
+            return self.impl.update(x)
+        self.impl.update(x)
+        return self.impl.mean() if self.kind == "SMA" else self.impl.wma()
+
+    def save(self):
+        return self.impl.save()
+
+    def restore(self, saved):
+        self.impl.restore(saved)
+
+class _IndicatorState:
+    def __init__(self, params):
+        self.params = params
+        self.prev_close = None
+        self.obv = 0.0
+        self.obv_ma = _Ema(9)
+        self.rsi_pos = _Ewm(1.0 / params["LC_RSI_NPERIODI"], adjust=True, min_periods=params["LC_RSI_NPERIODI"])
+        self.rsi_neg = _Ewm(1.0 / params["LC_RSI_NPERIODI"], adjust=True, min_periods=params["LC_RSI_NPERIODI"])
+        self.rsi_ma = _Ema(params["LC_RSI_MA_NPERIODI"])
+        self.macd_fast = _Ema(params["FAST_LENGTH"])
+        self.macd_slow = _Ema(params["SLOW_LENGTH"])
+        self.macd_signal = _Ema(params["SIGNAL_LENGTH"])
+        self.lc_mas = []
+        if params["LC_TIPO_MA"] in ("EMA", "SMA", "WMA"):
+            self.lc_mas = [_MovingAverage(params["LC_TIPO_MA"], params[f"LC_MA{k}_NPERIODI"]) for k in range(1, 5)]
+        ma_type = params["MA_TYPE_INPUT"]
+        length = params["MA_LENGTH_INPUT"]
+        self.obv_window = _Rolling(length)
+        self.obv_ema = _Ema(length) if ma_type == "EMA" else None
+        self.obv_smma = _Ewm(1.0 / length) if ma_type == "SMMA (RMA)" else None
+        self.vwma_num = _Rolling(length) if ma_type == "VWMA" else None
+        self.vwma_den = _Rolling(length) if ma_type == "VWMA" else None
+        self.components = [c for c in (self.obv_ma, self.rsi_pos, self.rsi_neg, self.rsi_ma, self.macd_fast,
+                                       self.macd_slow, self.macd_signal, *self.lc_mas, self.obv_window,
+                                       self.obv_ema, self.obv_smma, self.vwma_num, self.vwma_den) if c is not None]
+
+    def save(self):
+        """
+        Accumulatori scalari di tutti i componenti: restore annulla il successivo update.
+        """
+        return self.prev_close, self.obv, [c.save() for c in self.components]
+
+    def restore(self, saved):
+        self.prev_close, self.obv, components = saved
+        for component, state in zip(self.components, components):
+            component.restore(state)
+
+    def update(self, close, volume):
+        params = self.params
+        row = {}
+        # OBV (ta.obv: segno della variazione, primo valore positivo)
+        if self.prev_close is None:
+            diff = NAN
+            self.obv += volume
+        else:
+            diff = close - self.prev_close
+            self.obv += (1.0 if diff > 0 else -1.0 if diff < 0 else 0.0) * volume
+        self.prev_close = close
+        obv = self.obv
+        row["OBV"] = obv
+        obv_ma = self.obv_ma.update(obv)
+        row["OBV_MA"] = obv_ma if obv_ma == obv_ma else 0.0
+
+        # RSI (ta.rsi con RMA) e sua EMA
+        pos = NAN if diff != diff else max(diff, 0.0)
+        neg = NAN if diff != diff else min(diff, 0.0)
+        pos_avg = self.rsi_pos.update(pos)
+        neg_avg = self.rsi_neg.update(neg)
+        denom = pos_avg + abs(neg_avg)
+        rsi = 100.0 * pos_avg / denom if denom != 0 else NAN
+        row["RSI"] = rsi
+        row["RSI_MA"] = self.rsi_ma.update(rsi)
+
+        # MACD: la signal parte dal primo valore valido della MACD
+        macd = self.macd_fast.update(close) - self.macd_slow.update(close)
+        signal = self.macd_signal.update(macd) if macd == macd else NAN
+        row["MACD"] = macd
+        row["MACD_hist"] = macd - signal
+        row["MACD_signal"] = signal
+
+        for k, ma in enumerate(self.lc_mas, start=1):
+            row[f"lcMa{k}"] = ma.update(close)
+
+        # Media di smoothing dell'OBV e bande
+        ma_type = params["MA_TYPE_INPUT"]
+        self.obv_window.update(obv)
+        if ma_type in ["SMA", "SMA + Bollinger Bands"]:
+            smoothing = self.obv_window.mean()
+        elif ma_type == "EMA":
+            smoothing = self.obv_ema.update(obv)
+        elif ma_type == "SMMA (RMA)":
+            smoothing = self.obv_smma.update(obv)
+        elif ma_type == "WMA":
+            smoothing = self.obv_window.wma()
+        elif ma_type == "VWMA":
+            self.vwma_num.update(obv * volume)
+            self.vwma_den.update(volume)
+            smoothing = self.vwma_num.total() / self.vwma_den.total()
+        else:
+            smoothing = NAN
+        row["smoothingMA"] = smoothing
+        if ma_type == "SMA + Bollinger Bands":
+            stdev = self.obv_window.std() * params["BB_MULT_INPUT"]
+            row["smoothingStDev"] = stdev
+            row["upperBand"] = smoothing + stdev
+            row["lowerBand"] = smoothing - stdev
+            row["midUpperBand"] = smoothing + stdev / 2
+            row["midLowerBand"] = smoothing - stdev / 2
+        else:
+            for col in ["smoothingStDev", "upperBand", "lowerBand", "midUpperBand", "midLowerBand"]:
+                row[col] = NAN
+        return row
+
+class IndicatorEngine:
+    """
+    Motore incrementale degli indicatori, un'istanza per bot.
+    compute(df) restituisce le ultime 'tail' righe con gli stessi indicatori di compute_indicators.
+    """
+
+    def __init__(self, params, tail=2):
+        self.params = dict(params)
+        self.tail = tail
+        self._columns = None
+        self.reset()
+
+    def reset(self):
+        self._state = _IndicatorState(self.params)
+        self._rows = deque(maxlen=self.tail)
+        self.last_time = None
+        self.updates = 0
+
+    def update(self, close, volume):
+        """
+        Applica una candela chiusa e restituisce la riga di indicatori.
+        """
+        self.updates += 1
+        return self._state.update(close, volume)
+
+    def preview(self, close, volume):
+        """
+        Calcola la riga di indicatori per una candela in formazione senza modificare lo stato.
+        """
+        saved = self._state.save()
+        try:
+            return self._state.update(close, volume)
+        finally:
+            self._state.restore(saved)
+
+    def compute(self, df):
+        """
+        Aggiorna lo stato con le candele chiuse non ancora elaborate (tutte le righe tranne l'ultima)
+        e restituisce le ultime righe con OHLCV e indicatori. L'ultima riga è trattata come in formazione.
+        """
+        if df is None or df.empty:
+            return df
+        times = df.index
+        closes = df["Close"].to_numpy(dtype=np.float64)
+        volumes = df["Volume"].to_numpy(dtype=np.float64)
+        n_closed = len(df) - 1
+        pos = times.searchsorted(self.last_time) if self.last_time is not None else n_closed
+        if pos >= n_closed or times[pos] != self.last_time:
+            # Primo avvio o buco nella serie: si ricostruisce lo stato dall'inizio del frame
+            self.reset()
+            start = 0
+        else:
+            start = pos + 1
+        for i in range(start, n_closed):
+            self._rows.append(self.update(closes[i], volumes[i]))
+        if start < n_closed:
+            self.last_time = times[n_closed - 1]
+        rows = list(self._rows)[-(self.tail - 1):] if self.tail > 1 else []
+        rows.append(self.preview(closes[-1], volumes[-1]))
+        # Le righe conservate sono le ultime candele di df: un solo blocco float, senza loc/join
+        names = list(rows[-1])
+        if self._columns is None or not self._columns[:len(df.columns)].equals(df.columns):
+            self._columns = pd.Index([*df.columns, *names])
+        values = np.hstack([df.to_numpy(dtype=np.float64)[-len(rows):],
+                            np.array([[row[name] for name in names] for row in rows], dtype=np.float64)])
+        return pd.DataFrame(values, index=times[-len(rows):], columns=self._columns, copy=False)
+
+def parity_report(df, params):
+    """
+    Differenza massima (assoluta) per colonna tra il motore incrementale e compute_indicators.
+    """
+    from data_utils import compute_indicators
+    reference = compute_indicators(df.copy(), params)
+    state = _IndicatorState(params)
+    rows = [state.update(c, v) for c, v in zip(df["Close"].to_numpy(dtype=np.float64), df["Volume"].to_numpy(dtype=np.float64))]
+    incremental = pd.DataFrame(rows, index=df.index)
+    report = {}
+    for col in incremental.columns:
+        diff = (incremental[col] - reference[col]).abs()
+        scale = reference[col].abs().clip(lower=1.0)
+        report[col] = float((diff / scale).max(skipna=True)) if diff.notna().any() else 0.0
+    return report
+
+def _synthetic_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, n))
+    index = pd.date_range("2020-01-01", periods=n, freq="h", name="Open Time")
+    return pd.DataFrame({
+        "Open": close, "High": close + 0.5, "Low": close - 0.5,
+        "Close": close, "Volume": rng.uniform(1, 100, n)
+    }, index=index)
+
+def benchmark_engine(sizes=(1_000, 10_000, 100_000), updates=1_000, params=None):
+    """
+    Costo per aggiornamento del motore incrementale al variare della lunghezza dello storico,
+    confrontato con il ricalcolo completo di compute_indicators.
+    """
+    from data_utils import compute_indicators
+    from config import INDICATOR_PARAMS
+    params = params or INDICATOR_PARAMS
+    results = []
+    for n in sizes:
+        df = _synthetic_frame(n + updates)
+        engine = IndicatorEngine(params)
+        history = df.iloc[:n]
+        for close, volume in zip(history["Close"], history["Volume"]):
+            engine.update(close, volume)
+        tail = df.iloc[n:]
+        t0 = time.perf_counter()
+        for close, volume in zip(tail["Close"], tail["Volume"]):
+            engine.update(close, volume)
+        per_update = (time.perf_counter() - t0) / updates
+        t0 = time.perf_counter()
+        compute_indicators(history.copy(), params)
+        full = time.perf_counter() - t0
+        results.append({"history": n, "update_us": per_update * 1e6, "full_recompute_ms": full * 1e3})
+        print(f"[indicator_engine] storico {n:>7} | update: {per_update * 1e6:.1f}µs | compute_indicators: {full * 1e3:.1f}ms")
+    return results
+
+if __name__ == "__main__":
+    from config import INDICATOR_PARAMS
+    print("Parità con compute_indicators:", parity_report(_synthetic_frame(5_000), INDICATOR_PARAMS))
+    benchmark_engine()
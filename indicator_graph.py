@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+indicator_graph.py
+
+Grafo delle dipendenze degli indicatori (backend NumPy):
+- Ogni indicatore è un nodo con le proprie dipendenze (es. bande -> smoothingMA -> OBV).
+- Il chiamante richiede solo le colonne che usa; viene valutato solo il sottografo necessario
+  e gli intermedi condivisi sono calcolati una volta sola.
+- Colonne calcolate, tempi per nodo e tempo risparmiato sono esposti in get_graph_stats().
+"""
+
+import time
+from collections import Counter, defaultdict
+from threading import Lock
+import numpy as np
+import indicators as ind
+
+SOURCE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# Ordine delle colonne prodotte da compute_indicators
+INDICATOR_COLUMNS = [
+    "OBV", "OBV_MA", "RSI", "RSI_MA", "MACD", "MACD_hist", "MACD_signal",
+    "lcMa1", "lcMa2", "lcMa3", "lcMa4",
+    "smoothingMA", "smoothingStDev", "upperBand", "lowerBand", "midUpperBand", "midLowerBand",
+]
+
+# Colonne lette da single_bot.indicator_signal e dalla simulazione del backtest
+SIGNAL_COLUMNS = ["RSI", "RSI_MA", "OBV", "lowerBand", "upperBand", "lcMa1", "Close"]
+
+NODES = {}
+NODE_PARAMS = {}
+
+def node(name, *deps, params=()):
+    """
+    Registra una funzione come nodo del grafo. La funzione riceve (values, params)
+    e restituisce l'array del nodo, oppure None se non applicabile con quei parametri.
+    'params' elenca le chiavi di indicator_params lette direttamente dal nodo.
+    """
+    def decorator(func):
+        NODES[name] = (deps, func)
+        NODE_PARAMS[name] = tuple(params)
+        return func
+    return decorator
+
+@node("OBV", "Close", "Volume")
+def _obv(v, p):
+    return ind.obv(v["Close"], v["Volume"])
+
+@node("OBV_MA", "OBV")
+def _obv_ma(v, p):
+    return np.nan_to_num(ind.ema(v["OBV"], 9), nan=0.0)
+
+@node("RSI", "Close", params=("LC_RSI_NPERIODI",))
+def _rsi(v, p):
+    return ind.rsi(v["Close"], p["LC_RSI_NPERIODI"])
+
+@node("RSI_MA", "RSI", params=("LC_RSI_MA_NPERIODI",))
+def _rsi_ma(v, p):
+    return ind.ema(v["RSI"], p["LC_RSI_MA_NPERIODI"])
+
+@node("_macd", "Close", params=("FAST_LENGTH", "SLOW_LENGTH", "SIGNAL_LENGTH"))
+def _macd(v, p):
+    return ind.macd(v["Close"], p["FAST_LENGTH"], p["SLOW_LENGTH"], p["SIGNAL_LENGTH"])
+
+@node("MACD", "_macd")
+def _macd_line(v, p):
+    return v["_macd"][0]
+
+@node("MACD_hist", "_macd")
+def _macd_hist(v, p):
+    return v["_macd"][1]
+
+@node("MACD_signal", "_macd")
+def _macd_signal(v, p):
+    return v["_macd"][2]
+
+def _lc_ma(k):
+    def compute(v, p):
+        if p["LC_TIPO_MA"] not in ["EMA", "SMA", "WMA"]:
+            return None
+        return ind.moving_average(p["LC_TIPO_MA"], v["Close"], p[f"LC_MA{k}_NPERIODI"])
+    return compute
+
+for _k in range(1, 5):
+    node(f"lcMa{_k}", "Close", params=("LC_TIPO_MA", f"LC_MA{_k}_NPERIODI"))(_lc_ma(_k))
+
+@node("smoothingMA", "OBV", "Volume", params=("MA_TYPE_INPUT", "MA_LENGTH_INPUT"))
+def _smoothing_ma(v, p):
+    obv, length = v["OBV"], p["MA_LENGTH_INPUT"]
+    if p["MA_TYPE_INPUT"] in ["SMA", "SMA + Bollinger Bands"]:
+        return ind.sma(obv, length)
+    if p["MA_TYPE_INPUT"] == "EMA":
+        return ind.ema(obv, length)
+    if p["MA_TYPE_INPUT"] == "SMMA (RMA)":
+        return ind.ewm_mean(obv, 1 / length, adjust=False)
+    if p["MA_TYPE_INPUT"] == "WMA":
+        return ind.wma(obv, length)
+    if p["MA_TYPE_INPUT"] == "VWMA":
+        return ind.vwma(obv, v["Volume"], length)
+    return np.full(len(obv), np.nan)
+
+@node("_obvStDev", "OBV", params=("MA_LENGTH_INPUT",))
+def _obv_stdev(v, p):
+    return ind.rolling_std(v["OBV"], p["MA_LENGTH_INPUT"])
+
+@node("smoothingStDev", "_obvStDev", params=("MA_TYPE_INPUT", "BB_MULT_INPUT"))
+def _smoothing_stdev(v, p):
+    if p["MA_TYPE_INPUT"] != "SMA + Bollinger Bands":
+        return np.full(len(v["_obvStDev"]), np.nan)
+    return v["_obvStDev"] * p["BB_MULT_INPUT"]
+
+@node("upperBand", "smoothingMA", "smoothingStDev")
+def _upper_band(v, p):
+    return v["smoothingMA"] + v["smoothingStDev"]
+
+@node("lowerBand", "smoothingMA", "smoothingStDev")
+def _lower_band(v, p):
+    return v["smoothingMA"] - v["smoothingStDev"]
+
+@node("midUpperBand", "smoothingMA", "smoothingStDev")
+def _mid_upper_band(v, p):
+    return v["smoothingMA"] + v["smoothingStDev"] / 2
+
+@node("midLowerBand", "smoothingMA", "smoothingStDev")
+def _mid_lower_band(v, p):
+    return v["smoothingMA"] - v["smoothingStDev"] / 2
+
+@node("ATR", "High", "Low", "Close")
+def _atr(v, p):
+    return ind.atr(v["High"], v["Low"], v["Close"], length=14)
+
+@node("BB_WIDTH", "Close")
+def _bb_width(v, p):
+    lower, _, upper = ind.bbands(v["Close"], length=20, std=2)
+    return upper - lower
+
+_param_deps = {}
+
+def param_dependencies(name):
+    """
+    Chiavi di indicator_params da cui dipende il nodo, direttamente o tramite le sue dipendenze.
+    """
+    if name in SOURCE_COLUMNS:
+        return ()
+    if name not in _param_deps:
+        keys = set(NODE_PARAMS[name])
+        for dep in NODES[name][0]:
+            keys.update(param_dependencies(dep))
+        _param_deps[name] = tuple(sorted(keys))
+    return _param_deps[name]
+
+_stats_lock = Lock()
+_stats = {
+    "calls": 0,
+    "computed": Counter(),
+    "skipped": Counter(),
+    "node_time": defaultdict(float),
+    "time_saved_estimate": 0.0,
+    "batch_calls": 0,
+    "batch_nodes_total": 0,
+    "batch_nodes_computed": 0,
+}
+
+def resolve(columns):
+    """
+    Restituisce i nodi necessari per le colonne richieste, in ordine topologico.
+    """
+    order, seen = [], set()
+
+    def visit(name):
+        if name in seen or name in SOURCE_COLUMNS:
+            return
+        if name not in NODES:
+            raise KeyError(f"Indicatore sconosciuto: {name}")
+        seen.add(name)
+        for dep in NODES[name][0]:
+            visit(dep)
+        order.append(name)
+
+    for col in columns:
+        visit(col)
+    return order
+
+def evaluate(data, params, columns=None):
+    """
+    Calcola solo le colonne richieste (default: tutte quelle di compute_indicators)
+    e le scrive nel DataFrame. Le colonne di origine richieste (es. "Close") sono ignorate.
+    """
+    columns = INDICATOR_COLUMNS if columns is None else columns
+    order = resolve(columns)
+    values = {}
+    for name in order:
+        for dep in NODES[name][0]:
+            if dep in SOURCE_COLUMNS and dep not in values:
+                values[dep] = data[dep].to_numpy(dtype=np.float64)
+    timings = {}
+    for name in order:
+        t0 = time.perf_counter()
+        values[name] = NODES[name][1](values, params)
+        timings[name] = time.perf_counter() - t0
+    for col in columns:
+        if col in values and col not in SOURCE_COLUMNS and values[col] is not None:
+            data[col] = values[col]
+    _record(order, timings)
+    return data
+
+def evaluate_batch(data, param_sets, columns=None):
+    """
+    Calcola le colonne richieste per più insiemi di parametri sulla stessa serie OHLCV
+    (DataFrame o dizionario {colonna: array}).
+    Restituisce {colonna: array 2-D (insieme di parametri x tempo)}; le colonne non
+    applicabili per un insieme (es. lcMa con LC_TIPO_MA non gestito) sono NaN.
+    Ogni nodo è calcolato una sola volta per combinazione dei parametri da cui dipende:
+    l'OBV una volta sola, l'RSI una volta per LC_RSI_NPERIODI, ecc.
+    """
+    columns = INDICATOR_COLUMNS if columns is None else [c for c in columns if c not in SOURCE_COLUMNS]
+    order = resolve(columns)
+    sources = {src: np.asarray(data[src], dtype=np.float64) for src in SOURCE_COLUMNS if src in data}
+    n = len(sources["Close"])
+    out = {col: np.full((len(param_sets), n), np.nan) for col in columns}
+    keys = [{name: (name,) + tuple(params[k] for k in param_dependencies(name)) for name in order}
+            for params in param_sets]
+    # Si memorizzano solo i nodi effettivamente condivisi tra più insiemi di parametri
+    shared = {name for name in order if len({k[name] for k in keys}) < len(param_sets)}
+    memo = {}
+    computed = 0
+    timings = defaultdict(float)
+    for i, params in enumerate(param_sets):
+        values = dict(sources)
+        for name in order:
+            key = keys[i][name]
+            if key in memo:
+                values[name] = memo[key]
+                continue
+            t0 = time.perf_counter()
+            values[name] = NODES[name][1](values, params)
+            timings[name] += time.perf_counter() - t0
+            computed += 1
+            if name in shared:
+                memo[key] = values[name]
+        for col in columns:
+            if values[col] is not None:
+                out[col][i] = values[col]
+    with _stats_lock:
+        _stats["batch_calls"] += 1
+        _stats["batch_nodes_total"] += len(order) * len(param_sets)
+        _stats["batch_nodes_computed"] += computed
+    _record(order, timings)
+    return out
+
+def _record(order, timings):
+    computed = set(order)
+    with _stats_lock:
+        _stats["calls"] += 1
+        for name, elapsed in timings.items():
+            _stats["computed"][name] += 1
+            _stats["node_time"][name] += elapsed
+        for name in NODES:
+            if name in computed:
+                continue
+            _stats["skipped"][name] += 1
+            if _stats["computed"][name]:
+                _stats["time_saved_estimate"] += _stats["node_time"][name] / _stats["computed"][name]
+
+def get_graph_stats() -> dict:
+    """
+    Statistiche di profiling: chiamate, nodi calcolati/saltati, tempo cumulato per nodo
+    e stima del tempo risparmiato (costo medio dei nodi saltati).
+    """
+    with _stats_lock:
+        return {
+            "calls": _stats["calls"],
+            "computed": dict(_stats["computed"]),
+            "skipped": dict(_stats["skipped"]),
+            "node_time": dict(_stats["node_time"]),
+            "time_saved_estimate": _stats["time_saved_estimate"],
+            "batch_calls": _stats["batch_calls"],
+            "batch_nodes_total": _stats["batch_nodes_total"],
+            "batch_nodes_computed": _stats["batch_nodes_computed"],
+        }
+
+def reset_graph_stats():
+    with _stats_lock:
+        _stats["calls"] = 0
+        _stats["computed"].clear()
+        _stats["skipped"].clear()
+        _stats["node_time"].clear()
+        _stats["time_saved_estimate"] = 0.0
+        _stats["batch_calls"] = 0
+        _stats["batch_nodes_total"] = 0
+        _stats["batch_nodes_computed"] = 0
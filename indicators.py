@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+indicators.py
+
+Kernel NumPy vettorializzati per gli indicatori della strategia:
+- OBV, RSI, EMA, SMA, WMA, MACD, ATR, Bollinger Bands e OBV smussato con VWMA.
+- Stessa semantica di pandas_ta (EMA con seme SMA, RSI/ATR con RMA, ...), senza
+  dipendere da pandas_ta né dal monkeypatch np.NaN.
+- I NaN in ingresso sono ammessi solo in testa alla serie (come per gli indicatori derivati).
+"""
+
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def _as_float(x):
+    return np.asarray(x, dtype=np.float64)
+
+def _nan_array(n):
+    return np.full(n, np.nan)
+
+def _linear_recurrence(u, w, y0=0.0):
+    """
+    y[t] = w * y[t-1] + u[t], con y[-1] = y0.
+    Risolta a blocchi in forma chiusa (somme cumulative pesate) per restare vettoriale
+    senza overflow di w**-k.
+    """
+    n = len(u)
+    y = np.empty(n)
+    if n == 0:
+        return y
+    if w == 0:
+        y[:] = u
+        return y
+    block = int(max(1, min(n, 500.0 / -math.log(w)))) if w < 1 else n
+    powers = w ** np.arange(block)
+    carry = y0
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        p = powers[:stop - start]
+        y[start:stop] = p * (w * carry + np.cumsum(u[start:stop] / p))
+        carry = y[stop - 1]
+    return y
+
+def ewm_mean(x, alpha, adjust=False, min_periods=0):
+    """
+    Equivalente di pandas Series.ewm(alpha=alpha, adjust=adjust, min_periods=min_periods).mean().
+    """
+    x = _as_float(x)
+    out = _nan_array(len(x))
+    valid = ~np.isnan(x)
+    if not valid.any():
+        return out
+    first = int(np.argmax(valid))
+    xs = x[first:]
+    w = 1.0 - alpha
+    if adjust:
+        num = _linear_recurrence(xs, w)
+        den = _linear_recurrence(np.ones(len(xs)), w)
+        out[first:] = num / den
+    else:
+        out[first] = xs[0]
+        out[first + 1:] = _linear_recurrence(alpha * xs[1:], w, y0=xs[0])
+    if min_periods > 1:
+        out[:first + min_periods - 1] = np.nan
+    return out
+
+def ema(x, length):
+    """
+    ta.ema: seme = media dei primi 'length' valori, poi ewm(span=length, adjust=False).
+    """
+    x = _as_float(x)
+    n = len(x)
+    if n < length:
+        return _nan_array(n)
+    z = x.copy()
+    head = x[:length]
+    head = head[~np.isnan(head)]
+    z[:length - 1] = np.nan
+    z[length - 1] = head.mean() if len(head) else np.nan
+    return ewm_mean(z, 2.0 / (length + 1), adjust=False)
+
+def rma(x, length):
+    """
+    ta.rma: ewm(alpha=1/length, adjust=True, min_periods=length).
+    """
+    return ewm_mean(x, 1.0 / length, adjust=True, min_periods=length)
+
+def _windows(x, length):
+    x = _as_float(x)
+    if len(x) < length:
+        return None
+    return sliding_window_view(x, length)
+
+def _pad(values, n):
+    out = _nan_array(n)
+    if values is not None:
+        out[n - len(values):] = values
+    return out
+
+def sma(x, length):
+    win = _windows(x, length)
+    return _pad(None if win is None else win.mean(axis=1), len(x))
+
+def rolling_sum(x, length):
+    win = _windows(x, length)
+    return _pad(None if win is None else win.sum(axis=1), len(x))
+
+def rolling_std(x, length, ddof=1):
+    win = _windows(x, length)
+    return _pad(None if win is None else win.std(axis=1, ddof=ddof), len(x))
+
+def wma(x, length):
+    """
+    ta.wma: media pesata linearmente (peso maggiore al valore più recente).
+    """
+    win = _windows(x, length)
+    if win is None:
+        return _nan_array(len(x))
+    weights = np.arange(1, length + 1, dtype=np.float64)
+    return _pad(win @ weights / (0.5 * length * (length + 1)), len(x))
+
+def moving_average(kind, x, length):
+    if kind == "EMA":
+        return ema(x, length)
+    if kind == "SMA":
+        return sma(x, length)
+    if kind == "WMA":
+        return wma(x, length)
+    raise ValueError(f"Tipo di media non supportato: {kind}")
+
+def obv(close, volume):
+    """
+    ta.obv: volume cumulato con il segno della variazione di prezzo (primo valore positivo).
+    """
+    close = _as_float(close)
+    if len(close) == 0:
+        return close
+    sign = np.sign(np.diff(close, prepend=close[0]))
+    sign[0] = 1.0
+    return np.cumsum(sign * _as_float(volume))
+
+def rsi(close, length):
+    """
+    ta.rsi con media RMA.
+    """
+    close = _as_float(close)
+    diff = np.diff(close, prepend=np.nan)
+    positive = np.where(diff > 0, diff, np.where(np.isnan(diff), np.nan, 0.0))
+    negative = np.where(diff < 0, diff, np.where(np.isnan(diff), np.nan, 0.0))
+    positive_avg = rma(positive, length)
+    negative_avg = rma(negative, length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100.0 * positive_avg / (positive_avg + np.abs(negative_avg))
+
+def macd(close, fast=12, slow=26, signal=9):
+    """
+    ta.macd: restituisce (macd, istogramma, signal).
+    """
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = _nan_array(len(line))
+    valid = ~np.isnan(line)
+    if valid.any():
+        first = int(np.argmax(valid))
+        signal_line[first:] = ema(line[first:], signal)
+    return line, line - signal_line, signal_line
+
+def true_range(high, low, close):
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    prev_close = np.concatenate([[np.nan], close[:-1]])
+    ranges = np.vstack([high - low, np.abs(high - prev_close), np.abs(prev_close - low)])
+    tr = np.max(ranges, axis=0)
+    tr[:1] = np.nan
+    return tr
+
+def atr(high, low, close, length=14):
+    """
+    ta.atr con media RMA.
+    """
+    return rma(true_range(high, low, close), length)
+
+def bbands(close, length=20, std=2.0, ddof=0):
+    """
+    ta.bbands con media SMA: restituisce (lower, mid, upper).
+    """
+    mid = sma(close, length)
+    deviation = std * rolling_std(close, length, ddof=ddof)
+    return mid - deviation, mid, mid + deviation
+
+def vwma(x, volume, length):
+    """
+    Media mobile pesata per volume (usata per smussare l'OBV).
+    """
+    x, volume = _as_float(x), _as_float(volume)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return rolling_sum(x * volume, length) / rolling_sum(volume, length)
+
+def _synthetic_ohlcv(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, n))
+    high = close + rng.uniform(0, 1, n)
+    low = close - rng.uniform(0, 1, n)
+    volume = rng.uniform(1, 100, n)
+    return high, low, close, volume
+
+def parity_suite(samples=None, rtol=1e-8):
+    """
+    Confronta ogni kernel con la controparte pandas_ta.
+    'samples' è una lista di (nome, high, low, close, volume); di default usa dati sintetici
+    e, se presenti, le candele registrate nell'archivio locale (kline_store).
+    Restituisce {campione: {indicatore: errore relativo massimo}} e stampa gli scostamenti oltre rtol.
+    """
+    import pandas as pd
+    np.NaN = np.nan
+    import pandas_ta as ta
+
+    if samples is None:
+        samples = [("synthetic", *_synthetic_ohlcv(5_000))]
+        try:
+            import os
+            from kline_store import KLINE_STORE_DIR, load_columns
+            for filename in sorted(os.listdir(KLINE_STORE_DIR))[:3]:
+                symbol, interval = filename[:-4].rsplit("_", 1)
+                cols = load_columns(symbol, interval)
+                if len(cols["close"]) > 300:
+                    samples.append((filename, cols["high"], cols["low"], cols["close"], cols["volume"]))
+        except OSError:
+            pass
+
+    def compare(ours, reference):
+        reference = np.asarray(reference, dtype=np.float64)
+        if np.any(np.isnan(ours) != np.isnan(reference)):
+            return float("inf")
+        mask = ~np.isnan(reference)
+        if not mask.any():
+            return 0.0
+        return float(np.max(np.abs(ours[mask] - reference[mask]) / np.maximum(np.abs(reference[mask]), 1.0)))
+
+    report = {}
+    for name, high, low, close, volume in samples:
+        h, l, c, v = (pd.Series(a) for a in (high, low, close, volume))
+        obv_ref = ta.obv(c, v)
+        macd_ref = ta.macd(c, fast=12, slow=26, signal=9)
+        bb_ref = ta.bbands(c, length=20, std=2)
+        ours_macd = macd(close, 12, 26, 9)
+        ours_bb = bbands(close, 20, 2.0)
+        checks = {
+            "OBV": (obv(close, volume), obv_ref),
+            "RSI": (rsi(close, 11), ta.rsi(c, length=11)),
+            "EMA": (ema(close, 9), ta.ema(c, length=9)),
+            "EMA(RSI)": (ema(rsi(close, 11), 9), ta.ema(ta.rsi(c, length=11), length=9)),
+            "SMA": (sma(close, 23), ta.sma(c, length=23)),
+            "WMA": (wma(close, 60), ta.wma(c, length=60)),
+            "MACD": (ours_macd[0], macd_ref["MACD_12_26_9"]),
+            "MACD_hist": (ours_macd[1], macd_ref["MACDh_12_26_9"]),
+            "MACD_signal": (ours_macd[2], macd_ref["MACDs_12_26_9"]),
+            "ATR": (atr(high, low, close, 14), ta.atr(h, l, c, length=14)),
+            "BBL": (ours_bb[0], bb_ref["BBL_20_2.0"]),
+            "BBU": (ours_bb[2], bb_ref["BBU_20_2.0"]),
+            "STDEV(OBV)": (rolling_std(obv(close, volume), 23), obv_ref.rolling(window=23).std()),
+            "VWMA(OBV)": (vwma(obv(close, volume), volume, 23),
+                          (obv_ref * v).rolling(window=23).sum() / v.rolling(window=23).sum()),
+        }
+        report[name] = {key: compare(ours, ref) for key, (ours, ref) in checks.items()}
+        for key, err in report[name].items():
+            status = "OK" if err <= rtol else "DIFF"
+            print(f"[indicators] {name:<24} {key:<12} errore max: {err:.2e} {status}")
+    return report
+
+if __name__ == "__main__":
+    parity_suite()
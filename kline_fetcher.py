@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+kline_fetcher.py
+
+Servizio unico per il download delle candele di tutti i simboli:
+- Un solo Client Binance condiviso e un pool di thread limitato.
+- Budget di request-weight condiviso, sincronizzato con l'header
+  X-MBX-USED-WEIGHT-1M restituito da Binance.
+- Consegna a ogni bot il proprio DataFrame, con abbastanza candele per il feature store ML.
+"""
+
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Condition, Lock
+from binance.client import Client
+from config import (API_KEY, API_SECRET, USE_TESTNET, KLINE_FETCH_WORKERS, REQUEST_WEIGHT_LIMIT, REQUEST_WEIGHT_SAFETY,
+                    LIVE_LOOKBACK_DAYS, ML_FEATURE_WARMUP_BARS)
+from data_utils import get_historical_data
+from kline_store import interval_to_ms
+from logging_system import log_error
+
+KLINES_PER_REQUEST = 1000
+KLINES_REQUEST_WEIGHT = 2
+LIVE_EXTRA_BARS = 3  # ultima candela nel feature store, candela appena chiusa, candela in formazione
+
+def live_lookback_days(interval, lookback_days=LIVE_LOOKBACK_DAYS):
+    """
+    Giorni di storico della finestra live: almeno lookback_days e almeno ML_FEATURE_WARMUP_BARS
+    candele prima delle ultime, altrimenti il feature store non aggiunge le candele chiuse.
+    """
+    warmup_days = (ML_FEATURE_WARMUP_BARS + LIVE_EXTRA_BARS) * interval_to_ms(interval) / 86_400_000
+    return max(lookback_days, math.ceil(warmup_days) + 1)
+
+class WeightBudget:
+    """
+    Budget di request-weight per finestra di un minuto, condiviso tra i thread.
+    """
+
+    def __init__(self, limit_per_minute=REQUEST_WEIGHT_LIMIT, safety=REQUEST_WEIGHT_SAFETY):
+        self.limit = int(limit_per_minute * safety)
+        self.used = 0
+        self.window = int(time.time() // 60)
+        self.condition = Condition()
+
+    def _roll_window(self):
+        window = int(time.time() // 60)
+        if window != self.window:
+            self.window = window
+            self.used = 0
+            self.condition.notify_all()
+
+    def acquire(self, weight: int):
+        """
+        Blocca finché nella finestra corrente c'è spazio per 'weight'.
+        """
+        weight = min(weight, self.limit)
+        with self.condition:
+            while True:
+                self._roll_window()
+                if self.used + weight <= self.limit:
+                    self.used += weight
+                    return
+                self.condition.wait(timeout=60 - time.time() % 60)
+
+    def sync(self, used_weight: int):
+        """
+        Allinea il contatore al peso effettivamente usato riportato da Binance.
+        """
+        with self.condition:
+            self._roll_window()
+            self.used = max(self.used, used_weight)
+
+    def stats(self) -> dict:
+        with self.condition:
+            self._roll_window()
+            return {"used": self.used, "limit": self.limit}
+
+class BudgetedClient:
+    """
+    Proxy del Client Binance che fa passare get_historical_klines dal budget condiviso.
+    Gli altri metodi sono delegati al Client originale.
+    """
+
+    def __init__(self, client, budget: WeightBudget):
+        self.client = client
+        self.budget = budget
+
+    def get_historical_klines(self, symbol, interval, start_str, *args, **kwargs):
+        self.budget.acquire(self._estimate_weight(interval, start_str))
+        klines = self.client.get_historical_klines(symbol, interval, start_str, *args, **kwargs)
+        self._sync_used_weight()
+        return klines
+
+    def _estimate_weight(self, interval, start_str):
+        if not isinstance(start_str, int):
+            return KLINES_REQUEST_WEIGHT
+        candles = max(1, (time.time() * 1000 - start_str) / interval_to_ms(interval))
+        return math.ceil(candles / KLINES_PER_REQUEST) * KLINES_REQUEST_WEIGHT
+
+    def _sync_used_weight(self):
+        try:
+            used = self.client.response.headers.get("x-mbx-used-weight-1m")
+            if used is not None:
+                self.budget.sync(int(used))
+        except Exception:
+            pass
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+class KlineFetcher:
+    """
+    Scarica le candele per più simboli in parallelo e le conserva fino al ritiro da parte dei bot.
+    """
+
+    def __init__(self, client=None, max_workers=KLINE_FETCH_WORKERS):
+        if client is None:
+            client = Client(API_KEY, API_SECRET, testnet=USE_TESTNET)
+        self.budget = WeightBudget()
+        self.client = BudgetedClient(client, self.budget)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="KlineFetch")
+        self.prefetched = {}
+        self.lock = Lock()
+
+    def fetch(self, symbol, interval, lookback_days=None):
+        """
+        Candele della finestra live; di default live_lookback_days(interval) giorni.
+        """
+        lookback_days = live_lookback_days(interval) if lookback_days is None else lookback_days
+        return get_historical_data(self.client, symbol, interval, lookback_days)
+
+    def fetch_all(self, intervals: dict, lookback_days=None) -> dict:
+        """
+        Scarica in parallelo le candele per {simbolo: intervallo}.
+        I risultati restano disponibili tramite pop_prefetched().
+        """
+        t0 = time.perf_counter()
+        futures = {
+            self.executor.submit(self.fetch, symbol, interval, lookback_days): (symbol, interval)
+            for symbol, interval in intervals.items()
+        }
+        results = {}
+        for future in as_completed(futures):
+            symbol, interval = futures[future]
+            try:
+                df = future.result()
+            except Exception as e:
+                log_error(f"[kline_fetcher] Errore download {symbol} {interval}: {e}")
+                continue
+            results[symbol] = df
+            with self.lock:
+                self.prefetched[(symbol, interval)] = df
+        print(f"[kline_fetcher] {len(results)}/{len(intervals)} simboli scaricati in {time.perf_counter() - t0:.1f}s | weight: {self.budget.stats()}")
+        return results
+
+    def pop_prefetched(self, symbol, interval):
+        """
+        Restituisce (e rimuove) il DataFrame già scaricato per il bot, se presente.
+        """
+        with self.lock:
+            return self.prefetched.pop((symbol, interval), None)
+
+_fetcher = None
+_fetcher_lock = Lock()
+
+def get_kline_fetcher() -> KlineFetcher:
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = KlineFetcher()
+        return _fetcher
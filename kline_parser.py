@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+kline_parser.py
+
+Parser delle klines grezze restituite da Binance:
+- Converte direttamente il payload in array NumPy tipizzati
+  (float64 per prezzi e volume, int64 epoch-ms per i tempi).
+- Ignora le colonne non utilizzate (quote volume, numero trade, ...).
+"""
+
+import time
+import numpy as np
+
+KLINE_FIELDS = ["open_time", "open", "high", "low", "close", "volume", "close_time"]
+
+def empty_columns() -> dict:
+    return {
+        "open_time": np.empty(0, dtype=np.int64),
+        "open": np.empty(0, dtype=np.float64),
+        "high": np.empty(0, dtype=np.float64),
+        "low": np.empty(0, dtype=np.float64),
+        "close": np.empty(0, dtype=np.float64),
+        "volume": np.empty(0, dtype=np.float64),
+        "close_time": np.empty(0, dtype=np.int64),
+    }
+
+def parse_klines(klines) -> dict:
+    """
+    Converte le klines ([open_time, open, high, low, close, volume, close_time, ...])
+    in un dizionario di array NumPy, uno per campo.
+    """
+    n = len(klines)
+    if n == 0:
+        return empty_columns()
+    # Un'unica conversione stringa -> float64 per i cinque campi OHLCV
+    ohlcv = np.array([k[1:6] for k in klines], dtype=np.float64).T.copy()
+    return {
+        "open_time": np.fromiter((k[0] for k in klines), dtype=np.int64, count=n),
+        "open": ohlcv[0],
+        "high": ohlcv[1],
+        "low": ohlcv[2],
+        "close": ohlcv[3],
+        "volume": ohlcv[4],
+        "close_time": np.fromiter((k[6] for k in klines), dtype=np.int64, count=n),
+    }
+
+def _legacy_parse(klines):
+    """
+    Percorso precedente (DataFrame di stringhe + pd.to_numeric), usato solo dal benchmark.
+    """
+    import pandas as pd
+    df = pd.DataFrame(klines, columns=[
+        "Open Time", "Open", "High", "Low", "Close", "Volume",
+        "Close Time", "Quote Asset Volume", "Number of Trades",
+        "Taker Buy Base Asset Volume", "Taker Buy Quote Asset Volume", "Ignore"
+    ])
+    df["Open Time"] = pd.to_datetime(df["Open Time"], unit='ms')
+    df["Close Time"] = pd.to_datetime(df["Close Time"], unit='ms')
+    for col in ["Open", "High", "Low", "Close", "Volume"]:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df.set_index("Open Time", inplace=True)
+    return df[["Open", "High", "Low", "Close", "Volume"]]
+
+def _synthetic_klines(n, start_ms=1_600_000_000_000, step_ms=60_000, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, n))
+    klines = []
+    for i in range(n):
+        c = close[i]
+        open_time = start_ms + i * step_ms
+        klines.append([
+            open_time, f"{c - 0.1:.8f}", f"{c + 0.5:.8f}", f"{c - 0.5:.8f}", f"{c:.8f}",
+            f"{rng.uniform(1, 100):.8f}", open_time + step_ms - 1, "0.0", 10, "0.0", "0.0", "0"
+        ])
+    return klines
+
+def benchmark_parser(sizes=(1_000, 10_000, 100_000), repeat=3):
+    """
+    Confronta parse_klines con il vecchio percorso DataFrame/pd.to_numeric.
+    """
+    results = []
+    for n in sizes:
+        klines = _synthetic_klines(n)
+        legacy = min(_time_call(_legacy_parse, klines) for _ in range(repeat))
+        fast = min(_time_call(parse_klines, klines) for _ in range(repeat))
+        speedup = legacy / fast if fast else float("inf")
+        results.append({"candles": n, "legacy_s": legacy, "parser_s": fast, "speedup": speedup})
+        print(f"[kline_parser] {n:>7} candele | legacy: {legacy:.4f}s | parser: {fast:.4f}s | speedup: x{speedup:.1f}")
+    return results
+
+def _time_call(func, arg):
+    t0 = time.perf_counter()
+    func(arg)
+    return time.perf_counter() - t0
+
+if __name__ == "__main__":
+    benchmark_parser()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+kline_store.py
+
+Archivio locale delle candele (klines) Binance:
+- Salva su disco le candele scaricate, una colonna per campo, per (simbolo, intervallo),
+  in una directory per ambiente (testnet o mainnet, da config.USE_TESTNET).
+- Permette di scaricare solo le candele successive all'ultima salvata.
+- Registra da quale istante lo storico è completo (covered_from): per le coppie quotate dopo
+  l'inizio del periodo richiesto (o con storico breve, come la testnet) non si riscarica tutto.
+"""
+
+import os
+import tempfile
+from threading import Lock
+import numpy as np
+import pandas as pd
+from kline_parser import KLINE_FIELDS, empty_columns, parse_klines
+from config import USE_TESTNET
+
+# Testnet e mainnet hanno candele diverse: non vanno mai unite nello stesso archivio
+KLINE_STORE_DIR = os.path.join("data/klines", "testnet" if USE_TESTNET else "mainnet")
+STORE_COLUMNS = KLINE_FIELDS
+
+INTERVAL_MS = {
+    "1m": 60_000,
+    "3m": 3 * 60_000,
+    "5m": 5 * 60_000,
+    "15m": 15 * 60_000,
+    "30m": 30 * 60_000,
+    "1h": 3_600_000,
+    "2h": 2 * 3_600_000,
+    "4h": 4 * 3_600_000,
+    "6h": 6 * 3_600_000,
+    "8h": 8 * 3_600_000,
+    "12h": 12 * 3_600_000,
+    "1d": 86_400_000,
+    "3d": 3 * 86_400_000,
+    "1w": 7 * 86_400_000,
+}
+
+_locks = {}
+_locks_lock = Lock()
+
+def interval_to_ms(interval: str) -> int:
+    if interval not in INTERVAL_MS:
+        raise ValueError(f"Intervallo non supportato: {interval}")
+    return INTERVAL_MS[interval]
+
+def get_store_lock(symbol: str, interval: str) -> Lock:
+    """
+    Restituisce il lock associato a (simbolo, intervallo), creandolo se necessario.
+    """
+    key = (symbol.upper(), interval)
+    with _locks_lock:
+        if key not in _locks:
+            _locks[key] = Lock()
+        return _locks[key]
+
+def _store_path(symbol: str, interval: str) -> str:
+    return os.path.join(KLINE_STORE_DIR, f"{symbol.upper()}_{interval}.npz")
+
+def _load_store(symbol: str, interval: str):
+    """
+    Colonne salvate e istante da cui lo storico è completo (None se non registrato).
+    """
+    path = _store_path(symbol, interval)
+    if not os.path.exists(path):
+        return empty_columns(), None
+    try:
+        with np.load(path) as npz:
+            covered_from = int(npz["covered_from"]) if "covered_from" in npz.files else None
+            return {col: npz[col] for col in STORE_COLUMNS}, covered_from
+    except Exception as e:
+        print(f"[kline_store] Errore lettura {path}: {e}")
+        return empty_columns(), None
+
+def load_columns(symbol: str, interval: str) -> dict:
+    """
+    Legge le colonne salvate per (simbolo, intervallo).
+    Restituisce colonne vuote se l'archivio non esiste o non è leggibile.
+    """
+    return _load_store(symbol, interval)[0]
+
+def save_columns(symbol: str, interval: str, columns: dict, covered_from: int = None):
+    """
+    Salva le colonne su disco in modo atomico (file temporaneo + rename). Il file temporaneo
+    ha un nome univoco: anche i processi di addestramento ML scrivono nello stesso archivio.
+    covered_from: istante da cui lo storico su Binance è completo (vedi update_store).
+    """
+    os.makedirs(KLINE_STORE_DIR, exist_ok=True)
+    path = _store_path(symbol, interval)
+    fd, tmp_path = tempfile.mkstemp(dir=KLINE_STORE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            extra = {} if covered_from is None else {"covered_from": np.int64(covered_from)}
+            np.savez(f, **{col: columns[col] for col in STORE_COLUMNS}, **extra)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+def merge_columns(old: dict, new: dict) -> dict:
+    """
+    Unisce due insiemi di colonne ordinati per open_time.
+    A parità di open_time prevale la candela più recente (es. candela ancora aperta).
+    """
+    if len(new["open_time"]) == 0:
+        return old
+    if len(old["open_time"]) == 0:
+        return new
+    keep = old["open_time"] < new["open_time"][0]
+    merged = {col: np.concatenate([old[col][keep], new[col]]) for col in STORE_COLUMNS}
+    order = np.argsort(merged["open_time"], kind="stable")
+    merged = {col: merged[col][order] for col in STORE_COLUMNS}
+    last = np.append(merged["open_time"][1:] != merged["open_time"][:-1], True)
+    return {col: merged[col][last] for col in STORE_COLUMNS}
+
+def columns_to_frame(columns: dict, start_ms: int = None) -> pd.DataFrame:
+    """
+    Converte le colonne nel DataFrame OHLCV usato da bot, backtest e ML.
+    """
+    if start_ms is not None:
+        mask = columns["open_time"] >= start_ms
+        columns = {col: columns[col][mask] for col in STORE_COLUMNS}
+    if len(columns["open_time"]) == 0:
+        return pd.DataFrame()
+    index = pd.DatetimeIndex(pd.to_datetime(columns["open_time"], unit="ms"), name="Open Time")
+    return pd.DataFrame({
+        "Open": columns["open"],
+        "High": columns["high"],
+        "Low": columns["low"],
+        "Close": columns["close"],
+        "Volume": columns["volume"],
+    }, index=index)
+
+def frame_to_columns(df: pd.DataFrame, interval: str) -> dict:
+    """
+    Operazione inversa di columns_to_frame.
+    """
+    if df is None or df.empty:
+        return empty_columns()
+    open_time = df.index.values.astype("datetime64[ms]").astype(np.int64)
+    return {
+        "open_time": open_time,
+        "open": df["Open"].to_numpy(dtype=np.float64),
+        "high": df["High"].to_numpy(dtype=np.float64),
+        "low": df["Low"].to_numpy(dtype=np.float64),
+        "close": df["Close"].to_numpy(dtype=np.float64),
+        "volume": df["Volume"].to_numpy(dtype=np.float64),
+        "close_time": open_time + interval_to_ms(interval) - 1,
+    }
+
+def update_store(client, symbol: str, interval: str, start_ms: int) -> dict:
+    """
+    Aggiorna l'archivio scaricando solo le candele mancanti e restituisce le colonne unite.
+    - Se l'archivio è vuoto scarica l'intero intervallo da start_ms.
+    - Se la prima candela salvata è successiva a start_ms e lo storico non è già noto come
+      completo da start_ms (covered_from), scarica solo le candele precedenti alla prima salvata.
+      Se Binance non ne ha (coppia quotata dopo start_ms) covered_from lo registra e la
+      richiesta non si ripete.
+    - Poi scarica dall'ultima open_time salvata, così l'ultima candela
+      (eventualmente ancora aperta) viene sostituita da quella aggiornata.
+    """
+    with get_store_lock(symbol, interval):
+        stored, covered_from = _load_store(symbol, interval)
+        stored_covered_from, merged = covered_from, stored
+        if len(stored["open_time"]) == 0:
+            print(f"[kline_store] Download completo {symbol} {interval}...")
+            merged = parse_klines(client.get_historical_klines(symbol, interval, start_ms))
+            covered_from = start_ms
+        else:
+            first = int(stored["open_time"][0])
+            if first > start_ms + interval_to_ms(interval) and (covered_from is None or covered_from > start_ms):
+                print(f"[kline_store] Download storico precedente {symbol} {interval} fino a "
+                      f"{pd.to_datetime(first, unit='ms')}...")
+                head = parse_klines(client.get_historical_klines(symbol, interval, start_ms, first - 1))
+                merged = merge_columns(head, stored)
+                covered_from = start_ms
+            fetch_from = int(stored["open_time"][-1])
+            print(f"[kline_store] Download incrementale {symbol} {interval} da {pd.to_datetime(fetch_from, unit='ms')}...")
+            merged = merge_columns(merged, parse_klines(client.get_historical_klines(symbol, interval, fetch_from)))
+        if len(merged["open_time"]) > 0 and (merged is not stored or covered_from != stored_covered_from):
+            save_columns(symbol, interval, merged, covered_from)
+        return merged
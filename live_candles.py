@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+live_candles.py
+
+Finestre di candele in memoria alimentate dallo stream WebSocket <symbol>@kline_<interval>:
+- Una finestra mobile per (simbolo, intervallo), letta direttamente dai bot.
+- La finestra viene inizializzata via REST e poi aggiornata solo dal WebSocket.
+- Dopo una riconnessione o un buco nello stream la finestra torna "non sincronizzata"
+  e il bot la riallinea con una nuova richiesta REST.
+"""
+
+import time
+from threading import Lock
+import numpy as np
+from kline_parser import empty_columns
+from kline_store import STORE_COLUMNS, columns_to_frame, frame_to_columns, interval_to_ms, merge_columns
+
+class CandleWindow:
+    def __init__(self, symbol: str, interval: str):
+        self.symbol = symbol
+        self.interval = interval
+        self.interval_ms = interval_to_ms(interval)
+        self.columns = empty_columns()
+        self.max_candles = None
+        self.synced = False
+        self.lock = Lock()
+
+    def seed(self, df):
+        """
+        Inizializza la finestra con le candele scaricate via REST,
+        mantenendo eventuali candele più recenti già arrivate dal WebSocket.
+        """
+        with self.lock:
+            seeded = {col: arr.copy() for col, arr in frame_to_columns(df, self.interval).items()}
+            self.columns = merge_columns(seeded, self.columns)
+            self.max_candles = len(seeded["open_time"])
+            self._trim()
+            self.synced = len(self.columns["open_time"]) > 0
+
+    def update(self, kline: dict):
+        """
+        Applica un evento kline del WebSocket (campo "k").
+        La candela in formazione viene sovrascritta, una nuova candela viene accodata.
+        """
+        open_time = int(kline["t"])
+        values = {
+            "open_time": open_time,
+            "open": float(kline["o"]),
+            "high": float(kline["h"]),
+            "low": float(kline["l"]),
+            "close": float(kline["c"]),
+            "volume": float(kline["v"]),
+            "close_time": int(kline["T"]),
+        }
+        with self.lock:
+            times = self.columns["open_time"]
+            if len(times) and open_time == times[-1]:
+                for col in STORE_COLUMNS:
+                    self.columns[col][-1] = values[col]
+                return
+            if len(times) and open_time < times[-1]:
+                return
+            if len(times) and open_time - times[-1] > self.interval_ms:
+                # Candele perse (es. durante una riconnessione): serve un riallineamento REST
+                self.synced = False
+            self.columns = {col: np.append(self.columns[col], values[col]).astype(self.columns[col].dtype)
+                            for col in STORE_COLUMNS}
+            self._trim()
+
+    def _trim(self):
+        if self.max_candles and len(self.columns["open_time"]) > self.max_candles:
+            self.columns = {col: self.columns[col][-self.max_candles:] for col in STORE_COLUMNS}
+
+    def mark_unsynced(self):
+        with self.lock:
+            self.synced = False
+
+    def to_frame(self):
+        with self.lock:
+            if not self.synced:
+                return None
+            if time.time() * 1000 >= self.columns["open_time"][-1] + self.interval_ms:
+                # Nessuna candela in formazione: lo stream non sta aggiornando la finestra
+                return None
+            return columns_to_frame({col: self.columns[col].copy() for col in STORE_COLUMNS})
+
+_windows = {}
+_windows_lock = Lock()
+
+def get_window(symbol: str, interval: str) -> CandleWindow:
+    key = (symbol.upper(), interval)
+    with _windows_lock:
+        if key not in _windows:
+            _windows[key] = CandleWindow(symbol.upper(), interval)
+        return _windows[key]
+
+def get_live_candles(symbol: str, interval: str):
+    """
+    Restituisce il DataFrame della finestra live, oppure None se non è sincronizzata.
+    """
+    with _windows_lock:
+        window = _windows.get((symbol.upper(), interval))
+    return window.to_frame() if window is not None else None
+
+def seed_live_candles(symbol: str, interval: str, df):
+    get_window(symbol, interval).seed(df)
+
+def process_kline_event(data: dict):
+    kline = data["k"]
+    get_window(data["s"], kline["i"]).update(kline)
+
+def mark_unsynced(symbol: str, interval: str):
+    with _windows_lock:
+        window = _windows.get((symbol.upper(), interval))
+    if window is not None:
+        window.mark_unsynced()
+
+def mark_all_unsynced():
+    with _windows_lock:
+        windows = list(_windows.values())
+    for window in windows:
+        window.mark_unsynced()
@@ -4,129 +4,488 @@ ml_strategy.py
 
 Modulo per la strategia ML:
 - Carica, addestra e ottimizza un modello RandomForest per le previsioni di trading.
-- Utilizza dati storici e indicatori calcolati in data_utils.
+- Le feature sono calcolate da feature_pipeline, con la stessa trasformazione per training,
+  backtest e inferenza; le matrici sono salvate per (simbolo, intervallo) e aggiornate solo
+  nelle righe nuove.
+- Nessun addestramento all'import o nel costruttore: il modello è caricato al primo utilizzo e,
+  se manca, viene addestrato in un processo separato. Nel frattempo vale la politica di
+  fallback (segnale base, confidenza 0: il plugin non prevale mai). Il nuovo modello
+  sostituisce il precedente in modo atomico; stato, avanzamento e durata sono in training_status().
+  Se il primo addestramento non produce un modello è ritentato dopo ML_TRAINING_RETRY_MINUTES.
+- Un modello per (simbolo, intervallo, versione delle feature), gestito da model_registry;
+  get_ml_plugin restituisce il plugin di ciascun bot. Al più ML_TRAINING_WORKERS addestramenti
+  contemporanei, gli altri restano in coda.
+- Retraining ogni ML_RETRAIN_INTERVAL trade chiusi o ML_RETRAIN_CANDLES nuove candele:
+  incrementale (nuovi alberi solo sulle nuove candele, feature già calcolate nel feature_store);
+  la ricerca completa degli iperparametri solo ogni ML_FULL_RETRAIN_HOURS ore.
 """
 
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from threading import Lock, Thread, BoundedSemaphore
 import numpy as np
-np.NaN = np.nan
-import pandas_ta as ta
 import pandas as pd
 import joblib
-import os
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
-from data_utils import get_historical_data, compute_indicators
-from config import API_KEY, API_SECRET, USE_TESTNET, ML_RETRAIN_INTERVAL, FEATURE_NAMES
-from binance.client import Client
-from error_handler import retry_on_failure
+from kline_store import interval_to_ms
+from feature_pipeline import feature_store
+from model_registry import model_registry, model_key, save_model_file
+from config import (API_KEY, API_SECRET, USE_TESTNET, ML_RETRAIN_INTERVAL, FEATURE_SET_VERSION, ML_TRAINING_WORKERS,
+                    ML_RETRAIN_CANDLES, ML_FULL_RETRAIN_HOURS, ML_INCREMENTAL_TREES, ML_INCREMENTAL_MIN_ROWS, ML_MAX_TREES, ML_FEATURE_WARMUP_BARS,
+                    ML_TRAINING_RETRY_MINUTES)
+
+FALLBACK_CONFIDENCE = 0.0
+
+_training_slots = BoundedSemaphore(ML_TRAINING_WORKERS)
+_plugins = {}
+_plugins_lock = Lock()
+
+def optimize_hyperparameters(X_train, y_train):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
+    param_grid = {
+        "n_estimators": [100, 200],
+        "max_depth": [10, 20],
+        "min_samples_split": [2, 5],
+        "min_samples_leaf": [1, 2]
+    }
+    model = RandomForestClassifier(random_state=42)
+    tscv = TimeSeriesSplit(n_splits=5)
+    grid_search = GridSearchCV(model, param_grid, cv=tscv, scoring="accuracy", n_jobs=-1)
+    grid_search.fit(X_train, y_train)
+    print(f"[MLStrategy] Migliori iperparametri: {grid_search.best_params_}")
+    return grid_search.best_estimator_
+
+def _fetch_history(symbol, interval, lookback_days=500):
+    from binance.client import Client
+    from data_utils import get_historical_data
+    from error_handler import retry_on_failure
+    client = Client(API_KEY, API_SECRET, testnet=USE_TESTNET)
+    return retry_on_failure(lambda: get_historical_data(client, symbol, interval, lookback_days=lookback_days))
+
+def load_training_meta(path):
+    """
+    Metadati dell'ultimo addestramento: ultima candela usata e istante della ricerca completa.
+    """
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_training_meta(path, **meta):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+def train_model(symbol="BTCUSDT", interval="1h", progress=None, meta_path=None):
+    """
+    Scarica i dati, aggiorna le feature nel feature_store e addestra il modello con GridSearchCV.
+    progress(fase, frazione) è chiamato a ogni fase. Restituisce il modello o None.
+    Con meta_path salva i metadati per i retraining incrementali.
+    """
+    progress = progress or (lambda stage, fraction: None)
+    progress("download", 0.0)
+    df = _fetch_history(symbol, interval)
+    if df is None or df.empty:
+        print(f"[MLStrategy] Nessun dato per retraining di {symbol} {interval}.")
+        return None
+    progress("feature", 0.3)
+    feature_store.update(symbol, interval, df)
+    X, y, open_ms = feature_store.dataset(symbol, interval)
+    if len(y) < 100:
+        print("[MLStrategy] Dati insufficienti per retraining.")
+        return None
+    progress("grid search", 0.4)
+    model = optimize_hyperparameters(X, y)
+    if meta_path:
+        save_training_meta(meta_path, trained_until_ms=int(open_ms[-1]), full_trained_at=time.time())
+    progress("salvataggio", 0.95)
+    return model
+
+def update_model(symbol, interval, path, meta_path, progress=None):
+    """
+    Retraining incrementale: le feature delle candele chiuse dopo l'ultimo addestramento sono
+    calcolate (o già presenti) nel feature_store; alla foresta sono aggiunti ML_INCREMENTAL_TREES
+    alberi addestrati solo su di esse (warm_start). Gli alberi più vecchi oltre ML_MAX_TREES
+    sono scartati. Restituisce (modello, nuove righe); modello None se non c'è nulla da aggiornare.
+    """
+    progress = progress or (lambda stage, fraction: None)
+    meta = load_training_meta(meta_path)
+    if meta is None:
+        raise ValueError("nessun metadato per il retraining incrementale")
+    model = joblib.load(path)
+    last_ms = meta["trained_until_ms"]
+    stored = feature_store.get(symbol, interval)["open_ms"]
+    since_ms = min(last_ms, int(stored[-1])) if len(stored) else last_ms
+    progress("download", 0.0)
+    bar_days = interval_to_ms(interval) / 86_400_000
+    lookback_days = (time.time() * 1000 - since_ms) / 86_400_000 + ML_FEATURE_WARMUP_BARS * bar_days
+    df = _fetch_history(symbol, interval, lookback_days=lookback_days + 1)
+    if df is None or df.empty:
+        return None, 0
+    progress("feature", 0.3)
+    feature_store.update(symbol, interval, df)
+    X, y, open_ms = feature_store.dataset(symbol, interval, since_ms=last_ms)
+    if len(y) < ML_INCREMENTAL_MIN_ROWS or len(np.unique(y)) < 2:
+        return None, len(y)
+    progress("warm start", 0.5)
+    # Finestra scorrevole di alberi: il costo di predizione resta limitato
+    if len(model.estimators_) + ML_INCREMENTAL_TREES > ML_MAX_TREES:
+        model.estimators_ = model.estimators_[len(model.estimators_) + ML_INCREMENTAL_TREES - ML_MAX_TREES:]
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + ML_INCREMENTAL_TREES)
+    model.fit(X, y)
+    progress("salvataggio", 0.9)
+    save_training_meta(meta_path, trained_until_ms=int(open_ms[-1]), full_trained_at=meta["full_trained_at"])
+    return model, len(y)
+
+def _training_process(queue, symbol, interval, path, meta_path, mode="full"):
+    """
+    Eseguito nel processo di addestramento: comunica avanzamento ed esito tramite la coda.
+    """
+    try:
+        progress = lambda stage, fraction: queue.put(("progress", stage, fraction))
+        if mode == "incremental":
+            model, rows = update_model(symbol, interval, path, meta_path, progress)
+            if model is None:
+                queue.put(("skipped", f"{rows} nuove candele, aggiornamento non necessario"))
+                return
+        else:
+            model = train_model(symbol, interval, progress, meta_path)
+            if model is None:
+                queue.put(("failed", "nessun modello addestrato"))
+                return
+        save_model_file(model, path)
+        queue.put(("done", path))
+    except Exception as e:
+        queue.put(("failed", str(e)))
 
-MODEL_PATH = "models/ml_model.pkl"
+def signal_from_proba(model, proba):
+    """
+    Segnali ("buy"/"sell") e confidenze da un'unica uscita di predict_proba.
+    """
+    classes = model.classes_[np.argmax(proba, axis=1)]
+    return np.where(classes == 1, "buy", "sell"), proba.max(axis=1)
 
 class MLStrategy:
-    def __init__(self):
-        self.model = self.load_model()
+    def __init__(self, symbol="BTCUSDT", interval="1h", version=FEATURE_SET_VERSION, registry=model_registry):
+        self.symbol = symbol.upper()
+        self.interval = interval
+        self.key = model_key(symbol, interval, version)
+        self.registry = registry
+        self.model_path = registry.path(self.key)
+        self.meta_path = registry.meta_path(self.key)
+        self.model_lock = Lock()
         self.trade_count = 0
-        self.feature_names = FEATURE_NAMES
-        if not hasattr(self.model, 'estimators_'):
-            print("[MLStrategy] Addestramento iniziale del modello...")
-            self.retrain_model()
+        self.candle_count = 0
+        self.last_candle = None
+        self.full_trained_at = None
+        self.feature_names = feature_store.pipeline.feature_names
+        self.loaded = False
+        self.retry_at = 0.0
+        self.status = {"state": "idle", "mode": None, "stage": None, "progress": 0.0,
+                       "started_at": None, "finished_at": None, "duration_s": None, "error": None}
+
+    @property
+    def model(self):
+        # Il registro può aver scaricato il modello: in tal caso lo ricarica dal disco
+        return self.registry.get(self.key) if self.loaded else None
 
     def load_model(self):
-        try:
-            if os.path.exists(MODEL_PATH):
-                print("[MLStrategy] Caricamento modello esistente...")
-                return joblib.load(MODEL_PATH)
-            else:
-                print("[MLStrategy] Creazione nuovo modello...")
-                return RandomForestClassifier(n_estimators=100, random_state=42)
-        except Exception as e:
-            print(f"[MLStrategy] Errore nel caricamento del modello: {e}")
-            return RandomForestClassifier(n_estimators=100, random_state=42)
+        return self.registry.get(self.key)
 
-    def save_model(self):
+    def save_model(self, model):
         try:
-            os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
-            joblib.dump(self.model, MODEL_PATH)
-            print("[MLStrategy] Modello salvato!")
+            self.registry.save(self.key, model)
+            print(f"[MLStrategy] Modello {self.symbol} {self.interval} salvato!")
         except Exception as e:
             print(f"[MLStrategy] Errore nel salvataggio del modello: {e}")
 
     def optimize_hyperparameters(self, X_train, y_train):
-        param_grid = {
-            "n_estimators": [100, 200],
-            "max_depth": [10, 20],
-            "min_samples_split": [2, 5],
-            "min_samples_leaf": [1, 2]
-        }
-        model = RandomForestClassifier(random_state=42)
-        tscv = TimeSeriesSplit(n_splits=5)
-        grid_search = GridSearchCV(model, param_grid, cv=tscv, scoring="accuracy", n_jobs=-1)
-        grid_search.fit(X_train, y_train)
-        print(f"[MLStrategy] Migliori iperparametri: {grid_search.best_params_}")
-        return grid_search.best_estimator_
-
-    def _ensure_indicators(self, df):
-        if "MACD" not in df.columns:
-            df["MACD"] = ta.macd(df["Close"], fast=12, slow=26, signal=9)["MACD_12_26_9"]
-        if "ATR" not in df.columns:
-            df["ATR"] = ta.atr(df["High"], df["Low"], df["Close"], length=14)
-        if "BB_WIDTH" not in df.columns:
-            bb = ta.bbands(df["Close"], length=20, std=2)
-            df["BB_WIDTH"] = bb["BBU_20_2.0"] - bb["BBL_20_2.0"]
-        return df
+        return optimize_hyperparameters(X_train, y_train)
 
-    def retrain_model(self):
-        print("[MLStrategy] Inizio retraining del modello...")
-        client = Client(API_KEY, API_SECRET, testnet=USE_TESTNET)
-        df = retry_on_failure(lambda: get_historical_data(client, "BTCUSDT", "1h", lookback_days=500))
-        if df is None or df.empty:
-            print("[MLStrategy] Nessun dato per retraining.")
+    def ensure_model(self):
+        """
+        Al primo utilizzo carica il modello salvato; se manca avvia l'addestramento in background
+        (dopo un primo addestramento non riuscito, solo da retry_at in poi).
+        Restituisce il modello corrente o None (politica di fallback).
+        """
+        if not self.loaded and time.time() >= self.retry_at:
+            start = False
+            with self.model_lock:
+                if not self.loaded and time.time() >= self.retry_at:
+                    self.loaded = True
+                    model = self.load_model()
+                    if not hasattr(model, "estimators_"):
+                        self.registry.evict(self.key)
+                        start = True
+            if start:
+                self.start_training()
+        return self.model
+
+    def swap_model(self, model=None):
+        """
+        Sostituisce il modello residente: quello passato oppure quello appena salvato su disco.
+        """
+        if model is None:
+            return self.registry.reload(self.key)
+        self.registry.save(self.key, model)
+        return model
+
+    def start_training(self, mode="full"):
+        """
+        Avvia l'addestramento ("full" o "incremental") in un processo separato,
+        se non è già in corso, e ritorna subito.
+        """
+        with self.model_lock:
+            if self.status["state"] == "training":
+                return False
+            self.status.update(state="training", mode=mode, stage="avvio", progress=0.0, started_at=time.time(),
+                               finished_at=None, duration_s=None, error=None)
+        Thread(target=self._run_training, args=(mode,), daemon=True,
+               name=f"ml-training-{self.symbol}-{self.interval}").start()
+        return True
+
+    def _full_retrain_due(self):
+        if not os.path.exists(self.model_path) or not os.path.exists(self.meta_path):
+            return True
+        if self.full_trained_at is None:
+            meta = load_training_meta(self.meta_path)
+            self.full_trained_at = float(meta["full_trained_at"]) if meta else 0.0
+        return time.time() - self.full_trained_at >= ML_FULL_RETRAIN_HOURS * 3600
+
+    def record_trade(self):
+        """
+        Da chiamare a ogni trade chiuso: dopo ML_RETRAIN_INTERVAL trade avvia il retraining.
+        """
+        with self.model_lock:
+            self.trade_count += 1
+        self.maybe_retrain()
+
+    def _record_candle(self, data):
+        if data.empty:
             return
-        params = {
-            "LC_RSI_NPERIODI": 11,
-            "LC_RSI_MA_NPERIODI": 9,
-            "FAST_LENGTH": 12,
-            "SLOW_LENGTH": 26,
-            "SIGNAL_LENGTH": 18,
-            "LC_TIPO_MA": "WMA",
-            "LC_MA1_NPERIODI": 5,
-            "LC_MA2_NPERIODI": 10,
-            "LC_MA3_NPERIODI": 60,
-            "LC_MA4_NPERIODI": 223,
-            "MA_TYPE_INPUT": "SMA + Bollinger Bands",
-            "MA_LENGTH_INPUT": 23,
-            "BB_MULT_INPUT": 3.4
-        }
-        df = compute_indicators(df, params)
-        df = self._ensure_indicators(df)
+        last = data.index[-1]
+        with self.model_lock:
+            if self.last_candle is not None and last != self.last_candle:
+                self.candle_count += 1
+            self.last_candle = last
+
+    def maybe_retrain(self):
+        """
+        Avvia il retraining se è stata raggiunta una delle soglie (trade o candele):
+        completo se è scaduto ML_FULL_RETRAIN_HOURS, altrimenti incrementale.
+        """
+        with self.model_lock:
+            if self.trade_count < ML_RETRAIN_INTERVAL and self.candle_count < ML_RETRAIN_CANDLES:
+                return False
+        mode = "full" if self._full_retrain_due() else "incremental"
+        if not self.start_training(mode):
+            return False
+        with self.model_lock:
+            self.trade_count = self.candle_count = 0
+        return True
+
+    def _run_training(self, mode):
+        if not _training_slots.acquire(blocking=False):
+            with self.model_lock:
+                self.status.update(stage="in coda")
+            _training_slots.acquire()
         try:
-            X = df[self.feature_names]
-        except KeyError as e:
-            print(f"[MLStrategy] Errore: {e}")
+            print(f"[MLStrategy] Addestramento ({mode}) del modello {self.symbol} {self.interval} avviato in background...")
+            context = multiprocessing.get_context("spawn")
+            queue = context.Queue()
+            process = context.Process(target=_training_process,
+                                      args=(queue, self.symbol, self.interval, self.model_path, self.meta_path, mode),
+                                      daemon=True, name=f"ml-training-{self.symbol}-{self.interval}")
+            process.start()
+            self._monitor_training(process, queue)
+        finally:
+            _training_slots.release()
+
+    def _monitor_training(self, process, queue):
+        while True:
+            try:
+                message = queue.get(timeout=1.0)
+            except Exception:
+                if process.is_alive():
+                    continue
+                message = ("failed", f"processo terminato (exit code {process.exitcode})")
+            if message[0] == "progress":
+                with self.model_lock:
+                    self.status.update(stage=message[1], progress=message[2])
+                continue
+            finished = time.time()
+            if message[0] == "done":
+                try:
+                    model = self.swap_model()
+                except Exception as e:
+                    print(f"[MLStrategy] Errore nel caricamento del nuovo modello: {e}")
+                    model = None
+                with self.model_lock:
+                    if self.status["mode"] == "full":
+                        self.full_trained_at = finished
+                    self.status.update(state="ready" if model is not None else "failed", stage=None,
+                                       progress=1.0, finished_at=finished,
+                                       duration_s=finished - self.status["started_at"])
+                print(f"[MLStrategy] Retraining completato in {self.status['duration_s']:.0f}s.")
+            elif message[0] == "skipped":
+                with self.model_lock:
+                    self.status.update(state="ready", stage=None, progress=1.0, finished_at=finished,
+                                       duration_s=finished - self.status["started_at"])
+                print(f"[MLStrategy] Retraining non eseguito: {message[1]}")
+            else:
+                with self.model_lock:
+                    self.status.update(state="failed", finished_at=finished, error=message[1],
+                                       duration_s=finished - self.status["started_at"])
+                print(f"[MLStrategy] Retraining fallito: {message[1]}")
+            if not os.path.exists(self.model_path):
+                # Nessun modello prodotto: ensure_model ritenterà dopo il backoff
+                with self.model_lock:
+                    self.loaded = False
+                    self.retry_at = finished + ML_TRAINING_RETRY_MINUTES * 60
+                print(f"[MLStrategy] Nessun modello {self.symbol} {self.interval}: nuovo tentativo tra "
+                      f"{ML_TRAINING_RETRY_MINUTES} minuti.")
+            # Il processo di addestramento può aver esteso l'archivio delle feature su disco
+            feature_store.reload(self.symbol, self.interval)
+            process.join(timeout=5)
             return
-        df["target"] = np.where(df["Close"].shift(-1) > df["Close"], 1, 0)
-        df.dropna(inplace=True)
-        if len(df) < 100:
-            print("[MLStrategy] Dati insufficienti per retraining.")
+
+    def training_status(self) -> dict:
+        with self.model_lock:
+            return dict(self.status, model_ready=self.model is not None)
+
+    def retrain_model(self):
+        """
+        Retraining sincrono nel processo corrente (uso manuale); i bot usano start_training.
+        """
+        print("[MLStrategy] Inizio retraining del modello...")
+        model = train_model(self.symbol, self.interval, meta_path=self.meta_path)
+        if model is None:
             return
-        X = df[self.feature_names]
-        y = df["target"]
-        best_model = self.optimize_hyperparameters(X, y)
-        self.model = best_model
-        self.save_model()
+        self.loaded = True
+        self.save_model(model)
         print("[MLStrategy] Retraining completato.")
 
-    def analyze(self, data, base_signal, price):
+    def feature_row(self, data):
+        """
+        Feature dell'ultima candela come matrice 1 x n, o None se non disponibili.
+        """
         try:
-            features = data[self.feature_names].iloc[-1].values.reshape(1, -1)
+            row = feature_store.features(self.symbol, self.interval, data)[-1:]
         except Exception as e:
             print(f"[MLStrategy] Errore nell'estrazione delle feature: {e}")
+            return None
+        return row if len(row) and not np.isnan(row).any() else None
+
+    def prepare(self, data):
+        """
+        Modello corrente e riga delle feature per analyze; aggiorna i contatori del retraining.
+        (None, None) senza modello.
+        """
+        model = self.ensure_model()
+        if model is None:
+            return None, None
+        self._record_candle(data)
+        self.maybe_retrain()
+        return model, self.feature_row(data)
+
+    def analyze(self, data, base_signal, price):
+        model, row = self.prepare(data)
+        if model is None:
+            return base_signal, FALLBACK_CONFIDENCE
+        if row is None:
             return base_signal, 0.5
-        prediction = self.model.predict(features)[0]
-        confidence = max(self.model.predict_proba(features)[0])
-        signal = "buy" if prediction == 1 else "sell"
-        return signal, confidence
+        signals, confidence = signal_from_proba(model, model.predict_proba(row))
+        return str(signals[0]), float(confidence[0])
+
+    def analyze_batch(self, data, base_signals=None):
+        """
+        Versione vettoriale di analyze per i backtest, su tutte le righe di data (una sola predict_proba).
+        Sola lettura: non avvia addestramenti e non scrive nel feature store. Sono valutate solo
+        le candele successive all'ultima usata in addestramento (fuori campione); le altre, e tutte
+        se la finestra di addestramento non è nota, ricevono i segnali base (o "hold") con la
+        confidenza di fallback, come analyze senza modello.
+        Restituisce (segnali "buy"/"sell", confidenze).
+        """
+        n = len(data)
+        fallback = np.asarray(base_signals if base_signals is not None else ["hold"] * n, dtype=object)
+        model = self.load_model()
+        meta = load_training_meta(self.meta_path)
+        if model is None or meta is None:
+            return fallback, np.full(n, FALLBACK_CONFIDENCE)
+        out_of_sample = data.index.values.astype("datetime64[ms]").astype(np.int64) > meta["trained_until_ms"]
+        if not out_of_sample.any():
+            return fallback, np.full(n, FALLBACK_CONFIDENCE)
+        try:
+            features = feature_store.features(self.symbol, self.interval, data, update=False)
+        except Exception as e:
+            print(f"[MLStrategy] Errore nell'estrazione delle feature: {e}")
+            return fallback, np.full(n, FALLBACK_CONFIDENCE)
+        valid = out_of_sample & ~np.isnan(features).any(axis=1)
+        signals, confidence = fallback.copy(), np.full(n, FALLBACK_CONFIDENCE)
+        if valid.any():
+            signals[valid], confidence[valid] = signal_from_proba(model, model.predict_proba(features[valid]))
+        return signals, confidence
+
+def get_ml_plugin(symbol, interval) -> MLStrategy:
+    """
+    Plugin ML condiviso dai bot con la stessa coppia (simbolo, intervallo).
+    """
+    key = model_key(symbol, interval)
+    with _plugins_lock:
+        plugin = _plugins.get(key)
+        if plugin is None:
+            plugin = _plugins[key] = MLStrategy(symbol, interval)
+        return plugin
+
+def training_retry_check():
+    """
+    Verifica del primo addestramento fallito su un registro temporaneo, con il processo di
+    addestramento simulato: il plugin non riavvia l'addestramento a ogni ciclo durante il
+    backoff e lo riavvia quando retry_at è scaduto.
+    """
+    import queue
+    import tempfile
+    from model_registry import ModelRegistry
+
+    class FailedProcess:
+        exitcode = 1
+
+        def is_alive(self):
+            return False
+
+        def join(self, timeout=None):
+            pass
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        ml = MLStrategy("TEST", "1h", registry=ModelRegistry(model_dir=model_dir))
+        started = []
+        ml.start_training = lambda mode="full": started.append(mode) or True
+        ml.ensure_model()
+        ml.status.update(state="training", mode="full", started_at=time.time())
+        messages = queue.Queue()
+        messages.put(("failed", "addestramento simulato"))
+        ml._monitor_training(FailedProcess(), messages)
+        ml.ensure_model()
+        backoff = not ml.loaded and ml.retry_at > time.time() and len(started) == 1
+        ml.retry_at = 0.0
+        model = ml.ensure_model()
+    ok = backoff and started == ["full", "full"] and model is None
+    print(f"[MLStrategy] Nuovo tentativo dopo addestramento fallito {'OK' if ok else 'ERRORE'}: "
+          f"avvii {len(started)}, backoff rispettato: {backoff}")
+    return ok
 
 if __name__ == "__main__":
+    assert training_retry_check()
     ml = MLStrategy()
     print("Test MLStrategy:", ml.analyze(pd.DataFrame(), "hold", 0))
+    print("Stato addestramento:", ml.training_status())
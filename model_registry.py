@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+model_registry.py
+
+Registro dei modelli ML per (simbolo, intervallo, versione del set di feature):
+- I modelli sono salvati in una directory versionata: models/<versione>/<SIMBOLO>_<intervallo>.pkl.
+- Un modello è caricato solo quando un bot lo richiede per la prima volta.
+- I modelli residenti formano una LRU con limite di memoria (stimato dalla dimensione
+  del file serializzato); quelli meno usati sono scaricati e ricaricati al bisogno.
+"""
+
+import os
+import tempfile
+from collections import OrderedDict
+from threading import Lock
+import joblib
+from config import ML_MODEL_DIR, ML_MODEL_CACHE_MAX_MB, FEATURE_SET_VERSION
+
+def model_key(symbol, interval, version=FEATURE_SET_VERSION):
+    return (symbol.upper(), interval, version)
+
+def save_model_file(model, path):
+    """
+    Salvataggio atomico (file temporaneo + rename): chi legge non vede mai un file parziale.
+    Il file temporaneo ha un nome univoco, così processi diversi non scrivono sullo stesso.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            joblib.dump(model, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+class ModelRegistry:
+    def __init__(self, model_dir=ML_MODEL_DIR, max_bytes=ML_MODEL_CACHE_MAX_MB * 1024 * 1024):
+        self.model_dir = model_dir
+        self.max_bytes = max_bytes
+        self.models = OrderedDict()
+        self.bytes = 0
+        self.lock = Lock()
+        self.stats = {"hits": 0, "loads": 0, "misses": 0, "evictions": 0}
+
+    def path(self, key):
+        symbol, interval, version = key
+        return os.path.join(self.model_dir, version, f"{symbol}_{interval}.pkl")
+
+    def meta_path(self, key):
+        """
+        Metadati dell'ultimo addestramento (ultima candela usata, ultima ricerca completa).
+        """
+        symbol, interval, version = key
+        return os.path.join(self.model_dir, version, f"{symbol}_{interval}.json")
+
+    def get(self, key):
+        """
+        Modello residente o caricato dal disco; None se non esiste ancora.
+        """
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                self.stats["hits"] += 1
+                return self.models[key][0]
+        path = self.path(key)
+        if not os.path.exists(path):
+            with self.lock:
+                self.stats["misses"] += 1
+            return None
+        try:
+            model = joblib.load(path)
+        except Exception as e:
+            print(f"[model_registry] Errore nel caricamento di {path}: {e}")
+            with self.lock:
+                self.stats["misses"] += 1
+            return None
+        print(f"[model_registry] Modello {key} caricato da {path}.")
+        with self.lock:
+            self.stats["loads"] += 1
+        self.put(key, model, os.path.getsize(path))
+        return model
+
+    def put(self, key, model, size):
+        with self.lock:
+            if key in self.models:
+                self.bytes -= self.models[key][1]
+            self.models[key] = (model, size)
+            self.models.move_to_end(key)
+            self.bytes += size
+            # Il modello appena inserito resta residente anche se da solo supera il limite
+            while self.bytes > self.max_bytes and len(self.models) > 1:
+                evicted_key, (_, evicted_size) = self.models.popitem(last=False)
+                self.bytes -= evicted_size
+                self.stats["evictions"] += 1
+                print(f"[model_registry] Modello {evicted_key} scaricato dalla memoria.")
+
+    def save(self, key, model):
+        path = self.path(key)
+        save_model_file(model, path)
+        self.put(key, model, os.path.getsize(path))
+
+    def reload(self, key):
+        """
+        Rilegge dal disco il modello appena salvato e lo sostituisce a quello residente in un solo passo.
+        """
+        path = self.path(key)
+        model = joblib.load(path)
+        self.put(key, model, os.path.getsize(path))
+        return model
+
+    def evict(self, key):
+        with self.lock:
+            entry = self.models.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.stats, resident=list(self.models), bytes=self.bytes, max_bytes=self.max_bytes)
+
+model_registry = ModelRegistry()
+
+def get_registry_stats() -> dict:
+    return model_registry.get_stats()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+monte_carlo.py
+
+Analisi di robustezza Monte Carlo di una strategia:
+- Bootstrap della sequenza dei trade (estrazione con reinserimento).
+- Block bootstrap circolare dei rendimenti candela per candela (preserva l'autocorrelazione
+  entro il blocco).
+- Jitter di commissioni e slippage in ogni run.
+Il pannello (rendimenti, eseguiti, trade) è calcolato una sola volta e condiviso con i worker;
+i run sono divisi in blocchi di dimensione fissa, ciascuno con il proprio seme derivato da
+SeedSequence, così i risultati sono identici con qualsiasi numero di worker.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from config import COMMISSION_RATE, SLIPPAGE_RATE
+from backtest_metrics import trade_events
+from vectorized_backtest import position_mask
+
+PERCENTILES = (5, 25, 50, 75, 95)
+RUNS_PER_CHUNK = 250
+
+def build_panel(close, entry_idx, exit_idx):
+    """
+    Pannello riutilizzato da tutti i run: rendimenti lordi della strategia per candela,
+    numero di eseguiti per candela e rapporto uscita/ingresso dei trade chiusi.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    returns = np.zeros(len(close))
+    returns[1:] = close[1:] / close[:-1] - 1
+    gross = np.where(position_mask(len(close), entry_idx, exit_idx), returns, 0.0)
+    closed = exit_idx >= 0
+    return {
+        "gross": gross,
+        "events": trade_events(len(close), entry_idx, exit_idx),
+        "trade_ratios": close[exit_idx[closed]] / close[entry_idx[closed]],
+    }
+
+def _max_drawdown_pct(equity):
+    return np.max(1 - equity / np.maximum.accumulate(equity, axis=1), axis=1) * 100
+
+def _jittered_costs(rng, runs, commission, slippage, jitter):
+    low = max(0.0, 1 - jitter)
+    factors = rng.uniform(low, 1 + jitter, size=(runs, 2))
+    return (commission * factors[:, 0] + slippage * factors[:, 1])[:, None]
+
+def simulate_chunk(panel, runs, seed_seq, block_length, commission=COMMISSION_RATE,
+                   slippage=SLIPPAGE_RATE, jitter=0.5):
+    """
+    Esegue 'runs' simulazioni con il generatore di seed_seq.
+    Restituisce {"block_return_pct", "block_max_drawdown_pct", "trade_return_pct", "trade_max_drawdown_pct"}.
+    """
+    rng = np.random.default_rng(seed_seq)
+    gross, events, ratios = panel["gross"], panel["events"], panel["trade_ratios"]
+    n = len(gross)
+    # Block bootstrap circolare di (rendimento, eseguiti) con costi variabili
+    cost = _jittered_costs(rng, runs, commission, slippage, jitter)
+    n_blocks = -(-n // block_length)
+    starts = rng.integers(0, n, size=(runs, n_blocks))
+    idx = ((starts[:, :, None] + np.arange(block_length)) % n).reshape(runs, -1)[:, :n]
+    equity = np.cumprod((1 + gross[idx]) * (1 - cost) ** events[idx], axis=1)
+    out = {
+        "block_return_pct": (equity[:, -1] - 1) * 100,
+        "block_max_drawdown_pct": _max_drawdown_pct(equity),
+    }
+    # Bootstrap dei trade chiusi con costi variabili
+    cost = _jittered_costs(rng, runs, commission, slippage, jitter)
+    if len(ratios):
+        picks = rng.integers(0, len(ratios), size=(runs, len(ratios)))
+        equity = np.cumprod(ratios[picks] * (1 - cost) ** 2, axis=1)
+        out["trade_return_pct"] = (equity[:, -1] - 1) * 100
+        out["trade_max_drawdown_pct"] = _max_drawdown_pct(np.concatenate([np.ones((runs, 1)), equity], axis=1))
+    else:
+        out["trade_return_pct"] = np.zeros(runs)
+        out["trade_max_drawdown_pct"] = np.zeros(runs)
+    return out
+
+_worker_panel = {}
+
+def _init_worker(panel):
+    _worker_panel.update(panel)
+
+def _run_chunk(runs, seed_seq, block_length, commission, slippage, jitter):
+    return simulate_chunk(_worker_panel, runs, seed_seq, block_length, commission, slippage, jitter)
+
+def run_monte_carlo(panel, n_runs=2000, seed=42, block_length=42, commission=COMMISSION_RATE,
+                    slippage=SLIPPAGE_RATE, jitter=0.5, workers=None):
+    """
+    Esegue n_runs simulazioni su un pool di processi.
+    Restituisce {metrica: {percentile: valore}} per rendimento e drawdown di entrambi i metodi.
+    """
+    if n_runs < 1:
+        raise ValueError(f"n_runs deve essere almeno 1 (ricevuto {n_runs})")
+    workers = workers or os.cpu_count() or 1
+    sizes = [min(RUNS_PER_CHUNK, n_runs - start) for start in range(0, n_runs, RUNS_PER_CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(panel,)) as pool:
+        # map mantiene l'ordine dei blocchi: il risultato non dipende dal numero di worker
+        chunks = list(pool.map(_run_chunk, sizes, seeds, [block_length] * len(sizes), [commission] * len(sizes),
+                               [slippage] * len(sizes), [jitter] * len(sizes)))
+    samples = {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+    print(f"[monte_carlo] {n_runs} run in {time.perf_counter() - t0:.1f}s con {workers} worker")
+    return {key: {p: float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+            for key, values in samples.items()}
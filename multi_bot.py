@@ -12,13 +12,14 @@ from single_bot import SingleBot
 from wallet import schedule_wallet_updates, send_wallet_update
 import binance_websocket
 from telegram_notifications import notify_trade, notify_startup
-from config import USE_TESTNET, API_KEY, API_SECRET, BOT_SETTINGS, CYCLE_INTERVAL
+from config import USE_TESTNET, API_KEY, API_SECRET, BOT_SETTINGS, CYCLE_INTERVAL, INTERVAL
 import symbols_config
 from performance_monitor import schedule_performance_report
 from telegram_bot import main as run_telegram_bot
-from config_manager import initialize_symbols_config
+from config_manager import initialize_symbols_config, load_config_for_pair
 from bot_registry import register_bot, unregister_bot, active_bots
 from error_handler import retry_on_failure
+from kline_fetcher import get_kline_fetcher
 import time
 
 report_thread = threading.Thread(target=schedule_performance_report, name="Performance_Report", daemon=True)
@@ -29,13 +30,19 @@ def start_wallet_updates():
     send_wallet_update()
     schedule_wallet_updates()
 
+def pair_interval(sym: str) -> str:
+    """
+    Intervallo della coppia dalla configurazione dinamica, la stessa fonte letta da SingleBot.
+    """
+    return (load_config_for_pair(sym) or {}).get("INTERVAL", INTERVAL)
+
 def start_bot_for_pair(sym: str):
     from bot_registry import is_bot_registered
     if is_bot_registered(sym):
         print(f"[multi_bot] Bot per {sym} già in esecuzione.")
         return
     settings = BOT_SETTINGS.get(sym, {})
-    timeframe = settings.get("timeframe", "4h")
+    timeframe = pair_interval(sym)
     cycle_interval = settings.get("cycle_interval", CYCLE_INTERVAL)
     print(f"[multi_bot] Avvio bot per {sym}: timeframe={timeframe}, cycle_interval={cycle_interval}")
     bot = SingleBot(symbol=sym, interval=timeframe, cycle_interval=cycle_interval, use_testnet=USE_TESTNET, api_key=API_KEY, api_secret=API_SECRET)
@@ -70,6 +77,9 @@ def main():
     websocket_thread = threading.Thread(target=binance_websocket.start_websocket, name="WebSocket", daemon=True)
     websocket_thread.start()
     print("[multi_bot] WebSocket thread avviato.")
+    timeframes = {sym: pair_interval(sym) for sym in startup_symbols}
+    print("[multi_bot] Download iniziale delle candele per tutti i simboli...")
+    get_kline_fetcher().fetch_all(timeframes)
     for sym in startup_symbols:
         print(f"[multi_bot] Avvio bot per {sym}...")
         start_bot_for_pair(sym)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+parameter_sweep.py
+
+Ottimizzazione parallela degli indicator_params:
+- Grid search o random search su simboli x spazio dei parametri.
+- Le candele di ogni simbolo sono caricate una sola volta nel processo principale
+  e condivise con i worker tramite multiprocessing.shared_memory.
+- Ogni worker valuta blocchi di parametri con compute_indicators_batch e il motore vettorializzato;
+  le metriche nette (backtest_metrics) sono record compatti ordinati con argsort.
+- I risultati classificati per simbolo sono salvati in un formato applicabile
+  direttamente con config_manager.update_bot_settings.
+"""
+
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+from config import INDICATOR_PARAMS
+from indicator_graph import SIGNAL_COLUMNS, evaluate_batch
+from vectorized_backtest import signal_masks, pair_trades
+from backtest_metrics import METRICS_DTYPE, evaluate_trades, rank
+from backtest_cache import backtest_cache, cost_settings, data_fingerprint, result_key
+
+SWEEP_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+OPTIMIZATION_RESULTS_PATH = "optimization_results.json"
+
+PARAM_GRID = {
+    "LC_RSI_NPERIODI": [6, 9, 11, 14],
+    "LC_RSI_MA_NPERIODI": [5, 9, 14],
+    "LC_TIPO_MA": ["EMA", "SMA", "WMA"],
+    "LC_MA1_NPERIODI": [5, 10, 20],
+    "MA_LENGTH_INPUT": [20, 23, 26, 30],
+    "BB_MULT_INPUT": [2.0, 2.5, 3.0, 3.4],
+}
+
+def build_param_sets(grid=None, method="grid", n_samples=200, seed=42, base_params=None):
+    """
+    Genera gli insiemi di parametri (base_params aggiornato con ogni combinazione della griglia).
+    method="random" estrae n_samples combinazioni distinte in modo riproducibile.
+    L'ordine segue la griglia, così insiemi con gli stessi parametri iniziali restano vicini
+    e condividono i calcoli nello stesso blocco.
+    """
+    grid = grid or PARAM_GRID
+    base_params = base_params or INDICATOR_PARAMS
+    keys = list(grid)
+    combos = list(itertools.product(*(grid[k] for k in keys)))
+    if method == "random" and n_samples < len(combos):
+        picked = sorted(random.Random(seed).sample(range(len(combos)), n_samples))
+        combos = [combos[i] for i in picked]
+    elif method not in ("grid", "random"):
+        raise ValueError(f"Metodo di ricerca non supportato: {method}")
+    return [dict(base_params, **dict(zip(keys, combo))) for combo in combos]
+
+# --- Memoria condivisa ---
+
+def share_array(values):
+    """
+    Copia un array in un nuovo blocco di memoria condivisa.
+    Restituisce (blocco, descrittore (nome, forma, dtype) da passare ai worker).
+    """
+    values = np.ascontiguousarray(values)
+    shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+    return shm, (shm.name, values.shape, values.dtype.str)
+
+def attach_array(descriptor):
+    """
+    Apre nel worker un blocco creato da share_array. Il blocco appartiene al processo
+    principale, che lo rimuove con release_frames. I worker (fork, spawn o forkserver)
+    condividono il suo resource_tracker: annullare la registrazione nel worker cancellerebbe
+    quella del processo principale.
+    """
+    name, shape, dtype = descriptor
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        # Nuova registrazione dello stesso nome nel tracker condiviso: nessun effetto
+        shm = shared_memory.SharedMemory(name=name)
+    _worker_blocks.append(shm)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+def share_frames(frames: dict):
+    """
+    Copia le colonne OHLCV di ogni simbolo in un blocco di memoria condivisa (5 x T float64).
+    Restituisce (blocchi aperti, descrittori {simbolo: descrittore} da passare ai worker).
+    """
+    blocks, descriptors = [], {}
+    for symbol, df in frames.items():
+        shm, descriptors[symbol] = share_array(df[SWEEP_COLUMNS].to_numpy(dtype=np.float64).T)
+        blocks.append(shm)
+    return blocks, descriptors
+
+def release_frames(blocks):
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+
+_worker_blocks = []
+_worker_data = {}
+
+def worker_frame(symbol):
+    """
+    Colonne OHLCV ({colonna: array}) del simbolo nel worker corrente.
+    """
+    return _worker_data[symbol]
+
+def attach_frames(descriptors):
+    for symbol, descriptor in descriptors.items():
+        values = attach_array(descriptor)
+        _worker_data[symbol] = {col: values[i] for i, col in enumerate(SWEEP_COLUMNS)}
+
+# --- Valutazione ---
+
+def evaluate_param_sets(arrays, param_sets, periods=365 * 6):
+    """
+    Valuta un blocco di insiemi di parametri su una serie OHLCV ({colonna: array}).
+    Restituisce un array di record METRICS_DTYPE (uno per insieme), al netto dei costi.
+    """
+    out = evaluate_batch(arrays, param_sets, columns=SIGNAL_COLUMNS)
+    close = arrays["Close"]
+    entry, exit_ = signal_masks(close, out["RSI"], out["RSI_MA"], out["OBV"],
+                                out["lowerBand"], out["upperBand"], out["lcMa1"])
+    metrics = np.zeros(len(param_sets), dtype=METRICS_DTYPE)
+    for i in range(len(param_sets)):
+        entry_idx, exit_idx = pair_trades(entry[i], exit_[i])
+        metrics[i] = evaluate_trades(close, entry_idx, exit_idx, periods=periods).metrics
+    return metrics
+
+def _evaluate_chunk(symbol, start, param_sets, periods):
+    return symbol, start, evaluate_param_sets(worker_frame(symbol), param_sets, periods)
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def run_parameter_sweep(frames: dict, param_sets, workers=None, chunk_size=None,
+                        score_key="sharpe", top_k=10, periods=365 * 6, interval="", use_cache=True):
+    """
+    Valuta tutti gli insiemi di parametri su tutti i simboli con un pool di processi.
+    Le combinazioni già valutate sulla stessa serie con gli stessi costi sono lette
+    dalla cache dei risultati (backtest_cache) e non vengono ricalcolate.
+    Restituisce {simbolo: i migliori top_k per score_key, come {"params": ..., metriche}}.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, min(64, len(param_sets) // workers or 1))
+    costs = cost_settings(periods=periods)
+    keys = [result_key(params, costs) for params in param_sets]
+    metrics, pending, fingerprints = {}, {}, {}
+    for symbol, df in frames.items():
+        if use_cache:
+            fingerprints[symbol] = data_fingerprint(df, interval)
+            metrics[symbol], found = backtest_cache.get_many(fingerprints[symbol], keys)
+            pending[symbol] = np.flatnonzero(~found)
+        else:
+            metrics[symbol] = np.zeros(len(param_sets), dtype=METRICS_DTYPE)
+            pending[symbol] = np.arange(len(param_sets))
+    todo = {symbol: df for symbol, df in frames.items() if len(pending[symbol])}
+    t0 = time.perf_counter()
+    if todo:
+        blocks, descriptors = share_frames(todo)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=attach_frames, initargs=(descriptors,)) as pool:
+                futures = [pool.submit(_evaluate_chunk, symbol, start,
+                                       [param_sets[i] for i in pending[symbol][start:start + chunk_size]], periods)
+                           for symbol in todo for start in range(0, len(pending[symbol]), chunk_size)]
+                for future in as_completed(futures):
+                    symbol, start, chunk_metrics = future.result()
+                    metrics[symbol][pending[symbol][start:start + len(chunk_metrics)]] = chunk_metrics
+        finally:
+            release_frames(blocks)
+        if use_cache:
+            for symbol in todo:
+                backtest_cache.put_many(fingerprints[symbol], [keys[i] for i in pending[symbol]],
+                                        metrics[symbol][pending[symbol]])
+            backtest_cache.flush()
+    elapsed = time.perf_counter() - t0
+    runs = sum(len(p) for p in pending.values())
+    cached = len(param_sets) * len(frames) - runs
+    print(f"[parameter_sweep] {runs} backtest in {elapsed:.1f}s con {workers} worker "
+          f"({runs / max(elapsed, 1e-9):.0f} run/s), {cached} dalla cache")
+    return {symbol: [dict(params=param_sets[i], **{f: m[i][f].item() for f in METRICS_DTYPE.names})
+                     for i in rank(m, score_key, top_k)]
+            for symbol, m in metrics.items()}
+
+def save_results(results, path=OPTIMIZATION_RESULTS_PATH):
+    """
+    Salva i risultati classificati: {simbolo: [{"params": ..., "INDICATOR_PARAMS": ..., metriche}, ...]}.
+    """
+    payload = {symbol: [dict(row, INDICATOR_PARAMS=row["params"]) for row in rows] for symbol, rows in results.items()}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=4, ensure_ascii=False)
+    print(f"[parameter_sweep] Risultati salvati in {path}.")
+
+def best_settings(results) -> dict:
+    """
+    {simbolo: {"INDICATOR_PARAMS": migliori parametri}} pronto per config_manager.update_bot_settings.
+    """
+    return {symbol: {"INDICATOR_PARAMS": rows[0]["params"]} for symbol, rows in results.items() if rows}
+
+def apply_results(path=OPTIMIZATION_RESULTS_PATH, symbols=None):
+    """
+    Applica i migliori parametri salvati alla configurazione dinamica dei bot.
+    """
+    from config_manager import update_bot_settings
+    with open(path, "r", encoding="utf-8") as f:
+        results = json.load(f)
+    for symbol, settings in best_settings(results).items():
+        if symbols is None or symbol in symbols:
+            update_bot_settings(symbol, settings)
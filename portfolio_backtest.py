@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+portfolio_backtest.py
+
+Backtest di portafoglio multi-simbolo con capitale condiviso:
+- Tutti i simboli sono allineati su un indice temporale comune come pannello 2-D
+  (tempo x simbolo) di prezzi e segnali di ingresso/uscita.
+- Le posizioni concorrenti attingono agli stessi saldi per valuta di quotazione (USDT, USDC, BTC),
+  con il dimensionamento di money_management.calculate_trade_quantity: RISK_PERCENT
+  (RISK_PERCENT_USDC per USDC) del saldo libero, vendita dell'intera quantità.
+- Ogni passo temporale è elaborato in modo vettoriale su tutti i simboli insieme.
+"""
+
+import numpy as np
+import pandas as pd
+from config import RISK_PERCENT, COMMISSION_RATE, SLIPPAGE_RATE, INITIAL_CAPITAL
+from money_management import get_quote_asset, RISK_PERCENT_USDC
+from backtest_metrics import METRICS_DTYPE, equity_metrics
+from indicator_graph import SIGNAL_COLUMNS
+from indicator_cache import cached_compute_indicators
+from vectorized_backtest import data_masks
+
+def build_panel(frames: dict, params, interval):
+    """
+    Calcola indicatori e segnali per simbolo e li allinea sull'unione degli indici temporali.
+    Restituisce (indice, simboli, close T x S, entry T x S, exit T x S); il prezzo è propagato
+    in avanti sulle candele mancanti, dove non ci sono segnali.
+    """
+    symbols = list(frames)
+    index = frames[symbols[0]].index
+    for symbol in symbols[1:]:
+        index = index.union(frames[symbol].index)
+    close = np.full((len(index), len(symbols)), np.nan)
+    entry = np.zeros((len(index), len(symbols)), dtype=bool)
+    exit_ = np.zeros((len(index), len(symbols)), dtype=bool)
+    for j, symbol in enumerate(symbols):
+        data = cached_compute_indicators(frames[symbol], params, symbol, interval, columns=SIGNAL_COLUMNS)
+        rows = index.get_indexer(data.index)
+        close[rows, j] = data["Close"].to_numpy(dtype=np.float64)
+        entry[rows, j], exit_[rows, j] = data_masks(data)
+    close = pd.DataFrame(close).ffill().to_numpy()
+    return index, symbols, close, entry, exit_
+
+def simulate_portfolio(close, entry, exit_, pools, risk, initial_balances,
+                       commission=COMMISSION_RATE, slippage=SLIPPAGE_RATE):
+    """
+    Simula il pannello candela per candela, vettorialmente sui simboli.
+    pools: indice del saldo (valuta di quotazione) di ogni simbolo; risk: frazione del saldo
+    libero investita a ogni acquisto. Come per bot concorrenti, il k-esimo acquisto sullo stesso
+    saldo nella stessa candela usa il saldo già ridotto dai precedenti: risk * (1 - risk) ** k.
+    Restituisce equity (T x pool), posizioni aperte (T x S), acquisti/vendite (T x S) e controvalore scambiato (T x pool).
+    """
+    n_bars, n_symbols = close.shape
+    n_pools = len(initial_balances)
+    prices = np.nan_to_num(close)
+    onehot = np.zeros((n_symbols, n_pools), dtype=bool)
+    onehot[np.arange(n_symbols), pools] = True
+    cost = commission + slippage
+    cash = np.asarray(initial_balances, dtype=np.float64).copy()
+    qty = np.zeros(n_symbols)
+    held = np.zeros(n_symbols, dtype=bool)
+    equity = np.empty((n_bars, n_pools))
+    holding = np.empty((n_bars, n_symbols), dtype=bool)
+    buys = np.zeros_like(entry)
+    sells = np.zeros_like(exit_)
+    traded = np.zeros((n_bars, n_pools))
+    for t in range(n_bars):
+        px = prices[t]
+        sell = held & exit_[t]
+        buy = ~held & entry[t] & (px > 0)
+        if sell.any():
+            proceeds = np.where(sell, qty * px, 0.0)
+            cash += np.bincount(pools, weights=proceeds * (1 - cost), minlength=n_pools)
+            traded[t] += np.bincount(pools, weights=proceeds, minlength=n_pools)
+            qty[sell] = 0.0
+            held &= ~sell
+        if buy.any():
+            rank = (np.cumsum(buy[:, None] & onehot, axis=0)[onehot] - 1).clip(min=0)
+            notional = np.where(buy, cash[pools] * risk * (1 - risk) ** rank, 0.0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                qty += np.where(buy, notional * (1 - cost) / px, 0.0)
+            spent = np.bincount(pools, weights=notional, minlength=n_pools)
+            cash -= spent
+            traded[t] += spent
+            held |= buy
+        equity[t] = cash + np.bincount(pools, weights=qty * px, minlength=n_pools)
+        holding[t] = held
+        buys[t] = buy
+        sells[t] = sell
+    return equity, holding, buys, sells, traded
+
+def run_portfolio_backtest(frames: dict, params, interval, initial_balances=None,
+                           commission=COMMISSION_RATE, slippage=SLIPPAGE_RATE, periods=365 * 6):
+    """
+    Backtest di portafoglio: restituisce {"equity": DataFrame (tempo x valuta), "metrics": {valuta: metriche},
+    "trades": DataFrame degli eseguiti, "exposure": DataFrame (tempo x simbolo)}.
+    initial_balances: {valuta di quotazione: saldo iniziale}, default INITIAL_CAPITAL per ogni valuta.
+    """
+    index, symbols, close, entry, exit_ = build_panel(frames, params, interval)
+    quotes = [get_quote_asset(symbol) for symbol in symbols]
+    pool_names = list(dict.fromkeys(quotes))
+    initial_balances = initial_balances or {}
+    balances = [initial_balances.get(quote, INITIAL_CAPITAL) for quote in pool_names]
+    pools = np.array([pool_names.index(q) for q in quotes])
+    risk = np.array([RISK_PERCENT_USDC if q == "USDC" else RISK_PERCENT for q in quotes])
+    equity, holding, buys, sells, traded = simulate_portfolio(close, entry, exit_, pools, risk, balances,
+                                                              commission, slippage)
+    onehot = np.eye(len(pool_names), dtype=np.int64)[pools]
+    events = ((buys.astype(np.int64) + sells) @ onehot).T
+    pool_held = (holding.astype(np.int64) @ onehot).T > 0
+    metrics = {}
+    for p, quote in enumerate(pool_names):
+        record = equity_metrics(equity[:, p], pool_held[p], events[p], periods=periods,
+                                initial_capital=balances[p])
+        record["trades"] = int(sells[:, pools == p].sum())
+        record["turnover"] = traded[:, p].sum() / equity[:, p].mean()
+        metrics[quote] = {field: record[field].item() for field in METRICS_DTYPE.names}
+    bars, cols = np.nonzero(buys | sells)
+    trades = pd.DataFrame({
+        "Time": index[bars],
+        "Symbol": np.asarray(symbols)[cols],
+        "Side": np.where(buys[bars, cols], "BUY", "SELL"),
+        "Price": close[bars, cols],
+    })
+    return {
+        "equity": pd.DataFrame(equity, index=index, columns=pool_names),
+        "metrics": metrics,
+        "trades": trades,
+        "exposure": pd.DataFrame(holding, index=index, columns=symbols),
+    }
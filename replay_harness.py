@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+replay_harness.py
+
+Replay accelerato del vero ciclo SingleBot.run su candele storiche:
+- Orologio simulato al posto del modulo time: sleep non attende, avanza alla candela successiva.
+- Client Binance finto (saldi, filtri LOT_SIZE, create_order) e get_latest_price finto.
+- Le candele sono servite al bot come se arrivassero dal WebSocket (get_live_candles).
+- Notifiche, log dei trade e configurazione dinamica sono sostituiti per tutta la durata del replay.
+Il codice del bot resta invariato; ogni segnale e ordine viene registrato e confrontato con
+il backtest vettorializzato sulle stesse candele.
+"""
+
+import contextlib
+import io
+import time
+import numpy as np
+from config import INTERVAL, INDICATOR_PARAMS, COMMISSION_RATE
+from kline_store import interval_to_ms
+
+class SimClock:
+    """
+    Sostituto del modulo time per single_bot: time() restituisce l'istante simulato,
+    sleep() passa subito alla candela successiva.
+    """
+    def __init__(self, replay):
+        self.replay = replay
+
+    def time(self):
+        return self.replay.now()
+
+    def sleep(self, seconds):
+        self.replay.advance()
+
+    def perf_counter(self):
+        return time.perf_counter()
+
+class FakeClient:
+    """
+    Client Binance finto: saldi in memoria, eseguiti al prezzo della candela corrente
+    con la commissione di config.
+    """
+    def __init__(self, replay, balances):
+        self.replay = replay
+        self.balances = dict(balances)
+        self.orders = []
+
+    def get_symbol_info(self, symbol):
+        return {"symbol": symbol, "filters": [
+            {"filterType": "LOT_SIZE", "stepSize": "0.00000001", "minQty": "0.00000001", "maxQty": "100000000"},
+        ]}
+
+    def get_account(self):
+        return {"balances": [{"asset": asset, "free": f"{free:.8f}", "locked": "0"}
+                             for asset, free in self.balances.items()]}
+
+    def create_order(self, symbol, side, type, quantity, **kwargs):
+        from money_management import get_base_asset, get_quote_asset
+        price = self.replay.price()
+        qty = float(quantity)
+        base, quote = get_base_asset(symbol), get_quote_asset(symbol)
+        if side == "BUY":
+            self.balances[quote] = self.balances.get(quote, 0.0) - qty * price
+            self.balances[base] = self.balances.get(base, 0.0) + qty * (1 - COMMISSION_RATE)
+        else:
+            self.balances[base] = self.balances.get(base, 0.0) - qty
+            self.balances[quote] = self.balances.get(quote, 0.0) + qty * price * (1 - COMMISSION_RATE)
+        order = {"symbol": symbol, "side": side, "type": type, "executedQty": quantity,
+                 "price": price, "time": self.replay.current_time(), "orderId": len(self.orders) + 1}
+        self.orders.append(order)
+        return order
+
+class Replay:
+    """
+    Stato del replay: candele, candela corrente e registrazioni.
+    """
+    def __init__(self, symbol, df, interval, balances, window=512, start=1):
+        self.symbol = symbol
+        self.df = df
+        self.interval_ms = interval_to_ms(interval)
+        self.window = window
+        self.step = start
+        self.client = FakeClient(self, balances)
+        self.clock = SimClock(self)
+        self.signals = []
+        self.bot = None
+        self.cycles = 0
+        self.open_ms = df.index.values.astype("datetime64[ms]").astype(np.int64)
+        self.closes = df["Close"].to_numpy(dtype=np.float64)
+
+    def now(self):
+        # Fine della candela corrente, quando il ciclo la vede chiusa
+        return (self.open_ms[self.step] + self.interval_ms) / 1000.0
+
+    def current_time(self):
+        return self.df.index[self.step]
+
+    def price(self):
+        return float(self.closes[self.step])
+
+    def candles(self, symbol, interval):
+        return self.df.iloc[max(0, self.step - self.window):self.step + 1]
+
+    def advance(self):
+        self.cycles += 1
+        self.step += 1
+        if self.step >= len(self.df):
+            self.step = len(self.df) - 1
+            self.bot.running = False
+
+    def record_signal(self, signal_func):
+        def wrapper(data, position_open):
+            signal = signal_func(data, position_open)
+            self.signals.append((self.current_time(), signal))
+            return signal
+        return wrapper
+
+@contextlib.contextmanager
+def _patched(module, **attrs):
+    saved = {name: getattr(module, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+def replay(symbol, df, interval=INTERVAL, plugin=None, balances=None, window=512, quiet=True):
+    """
+    Esegue SingleBot.run su tutte le candele di df (OHLCV indicizzato per "Open Time").
+    Restituisce {"orders", "signals", "cycles", "elapsed_s", "cycles_per_s", "balances"}.
+    """
+    import single_bot
+    from money_management import get_quote_asset
+    state = Replay(symbol, df, interval, balances or {get_quote_asset(symbol): 1_000_000.0}, window)
+    patches = dict(
+        time=state.clock,
+        Client=lambda *args, **kwargs: state.client,
+        get_latest_price=lambda s: state.price(),
+        get_live_candles=state.candles,
+        load_config_for_pair=lambda s: None,
+        notify_trade=lambda *args, **kwargs: None,
+        log_trade_event=lambda *args, **kwargs: None,
+        register_bot=lambda s, bot: None,
+        run_backtest=None,
+        indicator_signal=state.record_signal(single_bot.indicator_signal),
+    )
+    output = io.StringIO() if quiet else None
+    t0 = time.perf_counter()
+    with _patched(single_bot, **patches), (contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext()):
+        bot = single_bot.SingleBot(symbol=symbol, interval=interval)
+        bot.ml_plugin = plugin
+        state.bot = bot
+        bot.run()
+    elapsed = time.perf_counter() - t0
+    return {
+        "orders": state.client.orders,
+        "signals": state.signals,
+        "cycles": state.cycles,
+        "elapsed_s": elapsed,
+        "cycles_per_s": state.cycles / max(elapsed, 1e-9),
+        "balances": state.client.balances,
+    }
+
+def parity_check(df, orders, params=None):
+    """
+    Confronta gli ordini del replay con i trade di simulate_strategy_vectorized sulle stesse candele.
+    Restituisce {"matched", "backtest_only", "replay_only"} (liste di (tempo, lato)).
+    """
+    from data_utils import compute_indicators
+    from indicator_graph import SIGNAL_COLUMNS
+    from vectorized_backtest import simulate_strategy_vectorized
+    data = compute_indicators(df.copy(), params or INDICATOR_PARAMS, columns=SIGNAL_COLUMNS)
+    expected = set()
+    for trade in simulate_strategy_vectorized(data, verbose=False):
+        expected.add((trade["Entry Time"], "BUY"))
+        if "Exit Time" in trade:
+            expected.add((trade["Exit Time"], "SELL"))
+    actual = {(order["time"], order["side"]) for order in orders}
+    report = {
+        "matched": sorted(expected & actual),
+        "backtest_only": sorted(expected - actual),
+        "replay_only": sorted(actual - expected),
+    }
+    status = "OK" if not report["backtest_only"] and not report["replay_only"] else "DIFF"
+    print(f"[replay_harness] Parità {status}: {len(report['matched'])} ordini coincidenti, "
+          f"{len(report['backtest_only'])} solo nel backtest, {len(report['replay_only'])} solo nel replay")
+    return report
+
+def run_replay(symbol, interval=INTERVAL, lookback_days=90, plugin=None, check_parity=True):
+    """
+    Replay sulle candele dell'archivio locale (nessuna rete) con benchmark e verifica di parità.
+    """
+    from data_utils import get_local_data
+    df = get_local_data(symbol, interval, lookback_days)
+    if df.empty:
+        print(f"[replay_harness] Nessun dato locale per {symbol} {interval}.")
+        return None
+    result = replay(symbol, df, interval, plugin)
+    print(f"[replay_harness] {symbol}: {result['cycles']} cicli in {result['elapsed_s']:.2f}s "
+          f"({result['cycles_per_s']:.0f} cicli/s), {len(result['orders'])} ordini")
+    if check_parity and plugin is None:
+        result["parity"] = parity_check(df, result["orders"])
+    return result
+
+if __name__ == "__main__":
+    import symbols_config
+    run_replay(symbols_config.SYMBOLS[0])
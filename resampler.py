@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+resampler.py
+
+Motore di resampling multi-timeframe:
+- Per ogni simbolo viene scaricata e archiviata una sola risoluzione base (BASE_INTERVAL).
+- I timeframe superiori (4h, 1d, ...) sono ricavati come aggregazioni OHLCV
+  allineate ai confini delle candele Binance (UTC).
+- I frame derivati sono in cache e vengono invalidati all'arrivo di una nuova candela base.
+"""
+
+from threading import Lock
+import numpy as np
+from config import BASE_INTERVAL
+from kline_store import STORE_COLUMNS, interval_to_ms, update_store
+
+# Le candele settimanali Binance iniziano il lunedì, l'epoch Unix è un giovedì
+INTERVAL_OFFSET_MS = {"1w": 4 * 86_400_000}
+
+_cache = {}
+_cache_lock = Lock()
+cache_stats = {"hits": 0, "misses": 0}
+
+def can_derive(interval: str, base_interval: str = BASE_INTERVAL) -> bool:
+    """
+    True se 'interval' è un multiplo intero (>=) della risoluzione base.
+    """
+    try:
+        period = interval_to_ms(interval)
+        base = interval_to_ms(base_interval)
+    except ValueError:
+        return False
+    return period >= base and period % base == 0
+
+def align_down(timestamp_ms: int, interval: str) -> int:
+    period = interval_to_ms(interval)
+    offset = INTERVAL_OFFSET_MS.get(interval, 0)
+    return (timestamp_ms - offset) // period * period + offset
+
+def resample_columns(columns: dict, interval: str) -> dict:
+    """
+    Aggrega le colonne base nel timeframe richiesto
+    (Open=prima, High=max, Low=min, Close=ultima, Volume=somma).
+    Il primo bucket viene scartato se incompleto in testa.
+    """
+    n = len(columns["open_time"])
+    if n == 0:
+        return columns
+    period = interval_to_ms(interval)
+    offset = INTERVAL_OFFSET_MS.get(interval, 0)
+    buckets = (columns["open_time"] - offset) // period
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    open_time = buckets[starts] * period + offset
+    resampled = {
+        "open_time": open_time,
+        "open": columns["open"][starts],
+        "high": np.maximum.reduceat(columns["high"], starts),
+        "low": np.minimum.reduceat(columns["low"], starts),
+        "close": columns["close"][ends],
+        "volume": np.add.reduceat(columns["volume"], starts),
+        "close_time": open_time + period - 1,
+    }
+    if columns["open_time"][0] != open_time[0]:
+        resampled = {col: resampled[col][1:] for col in STORE_COLUMNS}
+    return resampled
+
+def _signature(columns: dict):
+    n = len(columns["open_time"])
+    if n == 0:
+        return (0,)
+    return (n, int(columns["open_time"][0]), int(columns["open_time"][-1]),
+            float(columns["close"][-1]), float(columns["volume"][-1]))
+
+def get_derived_columns(symbol: str, interval: str, base_columns: dict) -> dict:
+    """
+    Restituisce il frame derivato dalla cache, ricalcolandolo solo se la serie base è cambiata.
+    """
+    key = (symbol.upper(), interval)
+    signature = _signature(base_columns)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == signature:
+            cache_stats["hits"] += 1
+            return cached[1]
+        cache_stats["misses"] += 1
+    derived = resample_columns(base_columns, interval)
+    with _cache_lock:
+        _cache[key] = (signature, derived)
+    return derived
+
+def get_columns(client, symbol: str, interval: str, start_ms: int) -> dict:
+    """
+    Colonne OHLCV per (simbolo, intervallo) a partire da start_ms.
+    Se l'intervallo è derivabile dalla risoluzione base non viene fatta alcuna richiesta
+    aggiuntiva: si aggiorna solo l'archivio base.
+    """
+    if interval == BASE_INTERVAL or not can_derive(interval):
+        return update_store(client, symbol, interval, start_ms)
+    base_columns = update_store(client, symbol, BASE_INTERVAL, align_down(start_ms, interval))
+    return get_derived_columns(symbol, interval, base_columns)
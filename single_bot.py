@@ -14,18 +14,21 @@ import time
 import pandas as pd
 import numpy as np
 from binance.client import Client
-from config import API_KEY, API_SECRET, USE_TESTNET, INTERVAL, CYCLE_INTERVAL, BOT_SETTINGS
+from config import (API_KEY, API_SECRET, USE_TESTNET, INTERVAL, CYCLE_INTERVAL, BOT_SETTINGS, INDICATOR_PARAMS,
+                    ML_OVERRIDE_CONFIDENCE)
 from money_management import calculate_trade_quantity, get_quote_asset, get_base_asset, round_step_size, format_quantity
 from wallet import display_wallet
 from telegram_notifications import notify_trade
 from binance_websocket import get_latest_price
 from logging_system import log_trade_event, log_error
 from error_handler import retry_on_failure
-from ml_strategy import MLStrategy
+from ml_strategy import get_ml_plugin
 import symbols_config  # Deve contenere SYMBOLS = ["BTCUSDT", "ETHUSDT", ...]
 from decimal import Decimal, ROUND_DOWN
 from config_manager import load_config_for_pair
-from data_utils import get_historical_data, compute_indicators
+from indicator_engine import IndicatorEngine
+from kline_fetcher import get_kline_fetcher
+from live_candles import get_live_candles, seed_live_candles
 from bot_registry import register_bot
 
 def clean_symbol(symbol: str) -> str:
@@ -56,12 +59,16 @@ def indicator_signal(data, position_open):
         )
         return "sell" if exit_condition else "hold"
 
-# Inizializza plugin ML
-try:
-    ml_plugin = MLStrategy()
-except Exception as e:
-    ml_plugin = None
-    print(f"[single_bot] ⚠️ Plugin ML non disponibile: {e}")
+def load_ml_plugin(symbol, interval):
+    """
+    Plugin ML della coppia (simbolo, intervallo): costruzione immediata, il modello è caricato
+    dal registro (o addestrato in background) al primo utilizzo.
+    """
+    try:
+        return get_ml_plugin(symbol, interval)
+    except Exception as e:
+        print(f"[single_bot] ⚠️ Plugin ML non disponibile per {symbol} {interval}: {e}")
+        return None
 
 # Backtesting (se disponibile)
 try:
@@ -80,39 +87,31 @@ class SingleBot:
         self.use_testnet = use_testnet
         self.api_key = api_key
         self.api_secret = api_secret
-        self.ml_plugin = ml_plugin
+        self.ml_plugin = load_ml_plugin(self.symbol, self.interval)
         self.buy_price = None
         self.qty = None
+        self.candles = None
         self.active = True
         self.running = True
         self.start_time = time.time()
         self.client = Client(api_key, api_secret, testnet=use_testnet)
         self.bot_settings = BOT_SETTINGS.copy()
 
-        # Esegui backtest iniziale se ML plugin è disponibile
+        # Backtest iniziale in background se ML plugin è disponibile: l'avvio del bot non attende
+        self.backtest_results = None
         if run_backtest and self.ml_plugin:
-            print(f"[{self.symbol}] 🔍 Esecuzione del backtest per ottimizzazione ML...")
-            backtest_results = run_backtest(self.symbol, self.interval, self.ml_plugin)
-            print(f"[{self.symbol}] 📊 Risultati backtest: {backtest_results}")
-
-        self.indicator_params = {
-            "LC_RSI_NPERIODI": 11,
-            "LC_RSI_MA_NPERIODI": 9,
-            "FAST_LENGTH": 12,
-            "SLOW_LENGTH": 26,
-            "SIGNAL_LENGTH": 18,
-            "LC_TIPO_MA": "WMA",
-            "LC_MA1_NPERIODI": 5,
-            "LC_MA2_NPERIODI": 10,
-            "LC_MA3_NPERIODI": 60,
-            "LC_MA4_NPERIODI": 223,
-            "MA_TYPE_INPUT": "SMA + Bollinger Bands",
-            "MA_LENGTH_INPUT": 23,
-            "BB_MULT_INPUT": 3.4
-        }
+            print(f"[{self.symbol}] 🔍 Avvio backtest in background per ottimizzazione ML...")
+            run_backtest(self.symbol, self.interval, self.ml_plugin, on_done=self.on_backtest_done)
+
+        self.indicator_params = INDICATOR_PARAMS.copy()
+        self.indicator_engine = IndicatorEngine(self.indicator_params)
         # Registra il bot in maniera thread-safe
         register_bot(self.symbol, self)
 
+    def on_backtest_done(self, results):
+        self.backtest_results = results
+        print(f"[{self.symbol}] 📊 Risultati backtest: {results}")
+
     def stop(self):
         self.active = False
         print(f"[{self.symbol}] Bot in pausa.")
@@ -141,12 +140,21 @@ class SingleBot:
             log_error(f"[{self.symbol}] Errore nel recupero del prezzo dopo {max_attempts} tentativi.")
             return None
 
-        df = retry_on_failure(lambda: get_historical_data(self.client, self.symbol, self.interval))
-        if df is None or df.empty:
-            log_error(f"[{self.symbol}] Nessun dato storico ricevuto.")
-            return None
+        # Candele dal WebSocket; REST solo all'avvio o per colmare buchi dopo una riconnessione
+        df = get_live_candles(self.symbol, self.interval)
+        if df is None:
+            fetcher = get_kline_fetcher()
+            df = fetcher.pop_prefetched(self.symbol, self.interval)
+            if df is None:
+                df = retry_on_failure(lambda: fetcher.fetch(self.symbol, self.interval))
+            if df is None or df.empty:
+                log_error(f"[{self.symbol}] Nessun dato storico ricevuto.")
+                return None
+            seed_live_candles(self.symbol, self.interval, df)
 
-        return compute_indicators(df, self.indicator_params)
+        # Finestra OHLCV completa per il plugin ML: compute restituisce solo le ultime candele
+        self.candles = df
+        return self.indicator_engine.compute(df)
 
     def run(self):
         print(f"[{self.symbol}] Bot avviato con ciclo ogni {self.cycle_interval}s.")
@@ -159,10 +167,15 @@ class SingleBot:
             try:
                 new_config = retry_on_failure(lambda: load_config_for_pair(self.symbol))
                 if new_config:
+                    old_interval, old_params = self.interval, self.indicator_params
                     self.interval = new_config.get("INTERVAL", self.interval)
                     self.cycle_interval = new_config.get("CYCLE_INTERVAL", self.cycle_interval)
                     self.bot_settings = new_config.get("BOT_SETTINGS", self.bot_settings)
                     self.indicator_params = new_config.get("INDICATOR_PARAMS", self.indicator_params)
+                    if self.interval != old_interval or self.indicator_params != old_params:
+                        self.indicator_engine = IndicatorEngine(self.indicator_params)
+                    if self.interval != old_interval and self.ml_plugin:
+                        self.ml_plugin = load_ml_plugin(self.symbol, self.interval)
             except Exception as e:
                 log_error(f"[{self.symbol}] Errore nel caricamento della configurazione: {e}")
 
@@ -179,9 +192,9 @@ class SingleBot:
             # Integrazione ML: analizza il segnale base e aggiorna se il modello fornisce una previsione forte
             if self.ml_plugin:
                 try:
-                    ml_signal, confidence = self.ml_plugin.analyze(df, signal, price)
+                    ml_signal, confidence = self.ml_plugin.analyze(self.candles, signal, price)
                     print(f"[{self.symbol}] ML: {ml_signal} (Confidenza: {confidence})")
-                    if ml_signal != signal and confidence > 0.75:
+                    if ml_signal != signal and confidence > ML_OVERRIDE_CONFIDENCE:
                         signal = ml_signal
                 except Exception as e:
                     log_error(f"[{self.symbol}] Errore nell'analisi ML: {e}")
@@ -214,6 +227,8 @@ class SingleBot:
                     log_trade_event("SELL", self.symbol, qty, price, profit=profit)
                     self.buy_price = None
                     self.qty = None
+                    if self.ml_plugin:
+                        self.ml_plugin.record_trade()
             time.sleep(self.cycle_interval)
             
 if __name__ == "__main__":
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+vectorized_backtest.py
+
+Motore di backtest vettorializzato:
+- Le condizioni di ingresso/uscita (crossover/crossunder) sono calcolate come maschere su interi array.
+- La macchina a stati long-only, una posizione alla volta, è risolta saltando da un segnale
+  al successivo con searchsorted (un passo per trade, non per candela).
+- Restituisce la stessa lista di trade di backtesting_engine.simulate_strategy_loop.
+"""
+
+import time
+import numpy as np
+
+def crossover(a, b):
+    """
+    True in i se a[i-1] < b[i-1] e a[i] >= b[i] (False in 0 e con NaN).
+    """
+    out = np.zeros(a.shape, dtype=bool)
+    with np.errstate(invalid="ignore"):
+        out[..., 1:] = (a[..., :-1] < b[..., :-1]) & (a[..., 1:] >= b[..., 1:])
+    return out
+
+def crossunder(a, b):
+    """
+    True in i se a[i-1] > b[i-1] e a[i] <= b[i] (False in 0 e con NaN).
+    """
+    out = np.zeros(a.shape, dtype=bool)
+    with np.errstate(invalid="ignore"):
+        out[..., 1:] = (a[..., :-1] > b[..., :-1]) & (a[..., 1:] <= b[..., 1:])
+    return out
+
+def _prev_valid(x):
+    out = np.zeros(x.shape, dtype=bool)
+    out[..., 1:] = ~np.isnan(x[..., :-1])
+    return out
+
+def signal_masks(close, rsi, rsi_ma, obv, lower_band, upper_band, lc_ma1):
+    """
+    Maschere di ingresso e uscita della strategia (stesse condizioni di single_bot.indicator_signal).
+    Funziona anche su array 2-D (insieme di parametri x tempo).
+    """
+    entry = crossover(rsi, rsi_ma) & _prev_valid(lower_band) & crossover(obv, lower_band)
+    with np.errstate(invalid="ignore"):
+        exit_ = (close < lc_ma1) | (_prev_valid(upper_band) & crossunder(obv, upper_band))
+    entry[..., 0] = False
+    exit_[..., 0] = False
+    return entry, exit_
+
+def pair_trades(entry, exit_):
+    """
+    Risolve la macchina a stati: dopo un ingresso in e si cerca la prima uscita x > e,
+    poi il primo ingresso successivo a x. Restituisce (indici_ingresso, indici_uscita),
+    con -1 come uscita dell'eventuale posizione ancora aperta.
+    """
+    entries = np.flatnonzero(entry)
+    exits = np.flatnonzero(exit_)
+    entry_idx, exit_idx = [], []
+    pos = 0
+    while True:
+        k = np.searchsorted(entries, pos, side="left")
+        if k >= len(entries):
+            break
+        e = entries[k]
+        j = np.searchsorted(exits, e, side="right")
+        entry_idx.append(e)
+        if j >= len(exits):
+            exit_idx.append(-1)
+            break
+        x = exits[j]
+        exit_idx.append(x)
+        pos = x + 1
+    return np.asarray(entry_idx, dtype=np.int64), np.asarray(exit_idx, dtype=np.int64)
+
+def position_mask(n, entry_idx, exit_idx):
+    """
+    True nelle candele in cui la posizione è aperta: dalla candela successiva all'ingresso
+    fino all'uscita inclusa (fino all'ultima candela se la posizione resta aperta).
+    """
+    delta = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(delta, entry_idx + 1, 1)
+    np.add.at(delta, np.where(exit_idx >= 0, exit_idx, n - 1) + 1, -1)
+    return np.cumsum(delta[:n]) > 0
+
+def data_masks(data):
+    return signal_masks(
+        data["Close"].to_numpy(dtype=np.float64),
+        data["RSI"].to_numpy(dtype=np.float64),
+        data["RSI_MA"].to_numpy(dtype=np.float64),
+        data["OBV"].to_numpy(dtype=np.float64),
+        data["lowerBand"].to_numpy(dtype=np.float64),
+        data["upperBand"].to_numpy(dtype=np.float64),
+        data["lcMa1"].to_numpy(dtype=np.float64),
+    )
+
+def simulate_strategy_vectorized(data, verbose=True):
+    """
+    Versione vettorializzata di simulate_strategy: stessa lista di trade.
+    """
+    entry, exit_ = data_masks(data)
+    entry_idx, exit_idx = pair_trades(entry, exit_)
+    close = data["Close"].to_numpy(dtype=np.float64)
+    index = data.index
+    trades = []
+    profitto_totale = 0.0
+    for e, x in zip(entry_idx, exit_idx):
+        trade = {"Entry Time": index[e], "Entry Price": close[e]}
+        if x >= 0:
+            profit = (close[x] - close[e]) / close[e] * 100
+            trade.update({"Exit Time": index[x], "Exit Price": close[x], "Profit %": profit})
+            profitto_totale += profit
+        trades.append(trade)
+    if verbose:
+        print(f"Profitto totale strategia: {profitto_totale:.2f}%")
+    return trades
+
+def regression_check(data):
+    """
+    Confronta il motore vettorializzato con il loop originale sugli stessi dati.
+    """
+    from backtesting_engine import simulate_strategy_loop
+    expected = simulate_strategy_loop(data)
+    actual = simulate_strategy_vectorized(data)
+    if len(expected) != len(actual):
+        print(f"[vectorized_backtest] Numero di trade diverso: {len(expected)} vs {len(actual)}")
+        return False
+    for a, b in zip(expected, actual):
+        if a.keys() != b.keys() or any(a[k] != b[k] for k in a if k != "Profit %") or \
+                ("Profit %" in a and not np.isclose(a["Profit %"], b["Profit %"])):
+            print(f"[vectorized_backtest] Trade diverso: {a} vs {b}")
+            return False
+    print(f"[vectorized_backtest] Regressione OK ({len(actual)} trade).")
+    return True
+
+def _synthetic_data(n, seed=0):
+    import pandas as pd
+    from data_utils import compute_indicators
+    from indicator_graph import SIGNAL_COLUMNS
+    from backtesting_engine import BACKTEST_PARAMS
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    df = pd.DataFrame({
+        "Open": close, "High": close * 1.001, "Low": close * 0.999,
+        "Close": close, "Volume": rng.uniform(1, 100, n)
+    }, index=pd.date_range("2020-01-01", periods=n, freq="min", name="Open Time"))
+    return compute_indicators(df, BACKTEST_PARAMS, columns=SIGNAL_COLUMNS)
+
+def benchmark(sizes=(10_000, 100_000, 1_000_000), loop_max=100_000):
+    """
+    Tempi del motore vettorializzato e del loop originale (il loop solo fino a loop_max candele).
+    """
+    from backtesting_engine import simulate_strategy_loop
+    results = []
+    for n in sizes:
+        data = _synthetic_data(n)
+        t0 = time.perf_counter()
+        simulate_strategy_vectorized(data, verbose=False)
+        vectorized = time.perf_counter() - t0
+        loop = None
+        if n <= loop_max:
+            t0 = time.perf_counter()
+            simulate_strategy_loop(data)
+            loop = time.perf_counter() - t0
+        results.append({"candles": n, "vectorized_s": vectorized, "loop_s": loop})
+        loop_str = f"{loop:.3f}s" if loop is not None else "n/d"
+        print(f"[vectorized_backtest] {n:>9} candele | vettorializzato: {vectorized:.4f}s | loop: {loop_str}")
+    return results
+
+if __name__ == "__main__":
+    regression_check(_synthetic_data(20_000))
+    benchmark()
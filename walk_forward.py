@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+walk_forward.py
+
+Ottimizzazione walk-forward:
+- Fold rolling (finestra in-sample scorrevole) o anchored (in-sample sempre dall'inizio),
+  ciascuno seguito dal proprio periodo out-of-sample.
+- Indicatori e maschere di segnale sono calcolati una sola volta sull'intera serie per ogni
+  insieme di parametri e poi solo affettati per fold (nessun ricalcolo).
+- Le maschere restano in memoria condivisa; i fold di tutti i simboli sono ottimizzati in parallelo.
+- Restituisce, per simbolo, i parametri scelti per fold e l'equity out-of-sample concatenata.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from config import INITIAL_CAPITAL
+from indicator_graph import SIGNAL_COLUMNS, evaluate_batch
+from parameter_sweep import share_array, attach_array, share_frames, release_frames, attach_frames, worker_frame, chunked
+from vectorized_backtest import signal_masks, pair_trades
+from backtest_metrics import METRICS_DTYPE, evaluate_trades, rank
+
+def make_folds(n, train_bars, test_bars, anchored=False, step=None):
+    """
+    Restituisce i fold come tuple (inizio_is, fine_is, inizio_oos, fine_oos) di indici di candela.
+    I periodi out-of-sample sono consecutivi (step = test_bars) e l'ultimo può essere più corto.
+    """
+    if train_bars <= 0 or test_bars <= 0:
+        raise ValueError("train_bars e test_bars devono essere positivi")
+    step = step or test_bars
+    folds = []
+    train_end = train_bars
+    while train_end < n:
+        train_start = 0 if anchored else train_end - train_bars
+        folds.append((train_start, train_end, train_end, min(train_end + test_bars, n)))
+        train_end += step
+    return folds
+
+_worker_masks = {}
+
+def _attach_walk_forward(frame_descriptors, mask_descriptors):
+    attach_frames(frame_descriptors)
+    for symbol, (entry, exit_) in mask_descriptors.items():
+        _worker_masks[symbol] = (attach_array(entry), attach_array(exit_))
+
+def _compute_masks(symbol, start, param_sets):
+    """
+    Calcola indicatori e maschere sull'intera serie per un blocco di parametri
+    e li scrive nelle righe [start, start + len) delle maschere condivise.
+    """
+    arrays = worker_frame(symbol)
+    out = evaluate_batch(arrays, param_sets, columns=SIGNAL_COLUMNS)
+    entry, exit_ = signal_masks(arrays["Close"], out["RSI"], out["RSI_MA"], out["OBV"],
+                                out["lowerBand"], out["upperBand"], out["lcMa1"])
+    shared_entry, shared_exit = _worker_masks[symbol]
+    shared_entry[start:start + len(param_sets)] = entry
+    shared_exit[start:start + len(param_sets)] = exit_
+
+def _evaluate_fold(symbol, k, fold, score_key, periods):
+    """
+    Sceglie il miglior insieme di parametri in-sample e lo applica al periodo out-of-sample.
+    Restituisce anche i rendimenti netti candela per candela del periodo out-of-sample.
+    """
+    train_start, train_end, test_start, test_end = fold
+    entry, exit_ = _worker_masks[symbol]
+    close = worker_frame(symbol)["Close"]
+    train_close = close[train_start:train_end]
+    in_sample = np.zeros(entry.shape[0], dtype=METRICS_DTYPE)
+    for i in range(entry.shape[0]):
+        entry_idx, exit_idx = pair_trades(entry[i, train_start:train_end], exit_[i, train_start:train_end])
+        in_sample[i] = evaluate_trades(train_close, entry_idx, exit_idx, periods=periods).metrics
+    best = int(rank(in_sample, score_key, 1)[0])
+    entry_idx, exit_idx = pair_trades(entry[best, test_start:test_end], exit_[best, test_start:test_end])
+    result = evaluate_trades(close[test_start:test_end], entry_idx, exit_idx, initial_capital=1.0, periods=periods)
+    returns = result.equity / np.concatenate([[1.0], result.equity[:-1]]) - 1
+    return symbol, k, best, _as_dict(in_sample[best]), _as_dict(result.metrics), returns
+
+def _as_dict(record):
+    return {field: record[field].item() for field in METRICS_DTYPE.names}
+
+def run_walk_forward(frames: dict, param_sets, train_bars, test_bars, anchored=False,
+                     workers=None, chunk_size=None, score_key="sharpe", periods=365 * 6):
+    """
+    Walk-forward su più simboli. Restituisce {simbolo: {"folds": [...], "oos_equity": pd.Series,
+    "oos_return_pct": float}}; l'equity parte da INITIAL_CAPITAL ed è composta sui rendimenti
+    out-of-sample netti (commissioni e slippage) concatenati.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, min(64, len(param_sets) // workers or 1))
+    folds = {symbol: make_folds(len(df), train_bars, test_bars, anchored) for symbol, df in frames.items()}
+    frames = {symbol: df for symbol, df in frames.items() if folds[symbol]}
+    blocks, frame_descriptors = share_frames(frames)
+    mask_descriptors = {}
+    for symbol, df in frames.items():
+        empty = np.zeros((len(param_sets), len(df)), dtype=bool)
+        entry_shm, entry_desc = share_array(empty)
+        exit_shm, exit_desc = share_array(empty)
+        blocks += [entry_shm, exit_shm]
+        mask_descriptors[symbol] = (entry_desc, exit_desc)
+    fold_results = {symbol: [None] * len(folds[symbol]) for symbol in frames}
+    t0 = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_walk_forward,
+                                 initargs=(frame_descriptors, mask_descriptors)) as pool:
+            futures = [pool.submit(_compute_masks, symbol, start, chunk)
+                       for symbol in frames
+                       for start, chunk in zip(range(0, len(param_sets), chunk_size), chunked(param_sets, chunk_size))]
+            for future in as_completed(futures):
+                future.result()
+            masks_elapsed = time.perf_counter() - t0
+            futures = [pool.submit(_evaluate_fold, symbol, k, fold, score_key, periods)
+                       for symbol in frames for k, fold in enumerate(folds[symbol])]
+            for future in as_completed(futures):
+                symbol, k, best, in_sample, out_of_sample, returns = future.result()
+                fold_results[symbol][k] = (best, in_sample, out_of_sample, returns)
+    finally:
+        release_frames(blocks)
+    elapsed = time.perf_counter() - t0
+    n_folds = sum(len(f) for f in folds.values())
+    print(f"[walk_forward] {len(frames)} simboli, {n_folds} fold, {len(param_sets)} combinazioni: "
+          f"maschere {masks_elapsed:.1f}s, totale {elapsed:.1f}s con {workers} worker")
+
+    results = {}
+    for symbol, df in frames.items():
+        symbol_folds, returns = [], []
+        for (train_start, train_end, test_start, test_end), (best, in_sample, out_of_sample, fold_returns) \
+                in zip(folds[symbol], fold_results[symbol]):
+            symbol_folds.append({
+                "in_sample": (df.index[train_start], df.index[train_end - 1]),
+                "out_of_sample": (df.index[test_start], df.index[test_end - 1]),
+                "params": param_sets[best],
+                "in_sample_stats": in_sample,
+                "out_of_sample_stats": out_of_sample,
+            })
+            returns.append(fold_returns)
+        returns = np.concatenate(returns)
+        first_test = folds[symbol][0][2]
+        equity = pd.Series(INITIAL_CAPITAL * np.cumprod(1 + returns),
+                           index=df.index[first_test:first_test + len(returns)], name="OOS Equity")
+        results[symbol] = {
+            "folds": symbol_folds,
+            "oos_equity": equity,
+            "oos_return_pct": float((equity.iloc[-1] / INITIAL_CAPITAL - 1) * 100),
+        }
+    return results